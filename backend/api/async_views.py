@@ -0,0 +1,223 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAcceptable, NotFound)
+from rest_framework.response import Response
+
+from api.catalog import catalog_etag, catalog_last_modified
+from api.serializers import load_recipe_representations
+from api.utils import aget_subscribed_ids
+
+
+class AsyncTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        # Only the header is parsed here, aauthenticate reads the token.
+        return key
+
+    async def aauthenticate(self, request):
+        key = self.authenticate(request)
+        if key is None:
+            return AnonymousUser(), None
+        model = self.get_model()
+        token = await model.objects.select_related('user').filter(
+            key=key,
+        ).afirst()
+        if token is None or not token.user.is_active:
+            raise AuthenticationFailed
+        return token.user, token
+
+
+async def initial(view, request):
+    # APIView.initial with the token read by the async ORM.
+    view.format_kwarg = view.get_format_suffix(**view.kwargs)
+    renderer, media_type = view.perform_content_negotiation(request)
+    if renderer.format != 'json':
+        # The browsable API stays with the DRF view.
+        raise NotAcceptable
+    request.accepted_renderer = renderer
+    request.accepted_media_type = media_type
+    if all(
+        isinstance(authenticator, TokenAuthentication)
+        for authenticator in request.authenticators
+    ):
+        request.user, request.auth = (
+            await AsyncTokenAuthentication().aauthenticate(request)
+        )
+    else:
+        # Forced authentication of the test client, for one.
+        await sync_to_async(view.perform_authentication)(request)
+    view.check_permissions(request)
+    view.check_throttles(request)
+
+
+async def filter_queryset(view, request):
+    queryset = view.get_queryset()
+    if not request.query_params:
+        # Nothing to filter by, the filter backends are not worth a thread.
+        return queryset
+    return await sync_to_async(view.filter_queryset)(queryset)
+
+
+async def get_object(view, request):
+    queryset = await filter_queryset(view, request)
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        instance = await queryset.aget(
+            **{view.lookup_field: view.kwargs[lookup_url_kwarg]},
+        )
+    except (queryset.model.DoesNotExist, TypeError, ValueError,
+            ValidationError):
+        raise NotFound
+    view.check_object_permissions(request, instance)
+    return instance
+
+
+async def catalog_response(request, get_response):
+    # The condition() decorator of the catalog views, which only wraps
+    # sync views in Django 4.2.
+    etag = await sync_to_async(catalog_etag)(request)
+    last_modified = await sync_to_async(catalog_last_modified)(request)
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()),
+    )
+    if response is None:
+        response = await get_response()
+    response.headers.setdefault(
+        'Last-Modified',
+        http_date(last_modified.timestamp()),
+    )
+    response.headers.setdefault('ETag', etag)
+    return response
+
+
+async def catalog_list(view, request):
+    async def get_response():
+        if view.serves_snapshot(request):
+            return await sync_to_async(view.get_snapshot_response)(request)
+        queryset = await filter_queryset(view, request)
+        return Response(
+            view.get_serializer(
+                [item async for item in queryset],
+                many=True,
+            ).data,
+        )
+
+    return await catalog_response(request, get_response)
+
+
+async def catalog_detail(view, request):
+    async def get_response():
+        return Response(
+            view.get_serializer(await get_object(view, request)).data,
+        )
+
+    return await catalog_response(request, get_response)
+
+
+async def load_recipes(request, recipes):
+    # Everything the serializers would query is read before they run in
+    # the event loop.
+    if request.user.is_authenticated:
+        await aget_subscribed_ids(request)
+    await sync_to_async(load_recipe_representations)(recipes)
+
+
+async def recipe_list(view, request):
+    recipes = await view.paginator.apaginate_queryset(
+        await filter_queryset(view, request),
+        request,
+        view,
+    )
+    await load_recipes(request, recipes)
+    return view.get_paginated_response(
+        view.get_serializer(recipes, many=True).data,
+    )
+
+
+async def recipe_detail(view, request):
+    recipe = await get_object(view, request)
+    await load_recipes(request, [recipe])
+    return Response(view.get_serializer(recipe).data)
+
+
+async def subscriptions(view, request):
+    authors = await view.paginator.apaginate_queryset(
+        view.get_subscribed_authors(),
+        request,
+        view,
+    )
+    return view.get_subscriptions_response(
+        authors,
+        [recipe async for recipe in view.get_page_recipes(authors)],
+    )
+
+
+ASYNC_VIEWS = {
+    'tags-list': catalog_list,
+    'tags-detail': catalog_detail,
+    'ingredients-list': catalog_list,
+    'ingredients-detail': catalog_detail,
+    'recipes-list': recipe_list,
+    'recipes-detail': recipe_detail,
+    'users-subscriptions': subscriptions,
+}
+
+
+def render(response):
+    if not isinstance(response, Response):
+        return response
+    # Rendered here, Django would render a Response in a worker thread.
+    response.render()
+    return HttpResponse(
+        response.content,
+        status=response.status_code,
+        headers=response.headers,
+    )
+
+
+def async_read(async_view, callback):
+    sync_view = sync_to_async(callback)
+
+    @wraps(callback)
+    async def dispatch(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_view(request, *args, **kwargs)
+        # What ViewSetMixin.as_view() does before dispatch().
+        view = callback.cls(**callback.initkwargs)
+        view.action_map = {'head': callback.actions['get'], **callback.actions}
+        for method, action in view.action_map.items():
+            setattr(view, method, getattr(view, action))
+        view.args = args
+        view.kwargs = kwargs
+        view.request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        try:
+            await initial(view, view.request)
+            response = await async_view(view, view.request)
+        except APIException:
+            # Errors are rendered by the DRF view, so they stay identical.
+            return await sync_view(request, *args, **kwargs)
+        return render(
+            view.finalize_response(view.request, response, *args, **kwargs),
+        )
+
+    return dispatch
+
+
+def async_read_urls(urls):
+    for pattern in urls:
+        if pattern.name in ASYNC_VIEWS:
+            pattern.callback = async_read(
+                ASYNC_VIEWS[pattern.name],
+                pattern.callback,
+            )
+    return urls
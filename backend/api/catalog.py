@@ -0,0 +1,112 @@
+import gzip
+from bisect import bisect_left
+from threading import Lock
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from foodgram.replicas import use_primary
+from recipies.cache import bump_generation
+from recipies.models import Ingredient
+
+CATALOG_VERSION_KEY = 'catalog:version'
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def new_catalog_state():
+    return uuid4().hex, timezone.now().replace(microsecond=0)
+
+
+def get_catalog_state():
+    # The modification time is stored with the version, so every worker
+    # reports the same Last-Modified until the next bump.
+    return cache.get_or_set(CATALOG_VERSION_KEY, new_catalog_state, None)
+
+
+def save_catalog_state():
+    cache.set(CATALOG_VERSION_KEY, new_catalog_state(), None)
+
+
+def get_catalog_version():
+    return get_catalog_state()[0]
+
+
+def bump_catalog_version():
+    save_catalog_state()
+    # A snapshot may be rendered from the old rows before the commit.
+    transaction.on_commit(save_catalog_state)
+    # Cached recipes embed tag and ingredient names.
+    bump_generation()
+
+
+def catalog_etag(request, *args, **kwargs):
+    return f'W/"{get_catalog_version()}"'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_catalog_state()[1]
+
+
+def get_catalog_snapshot(name, render):
+    cache_key = f'catalog:{get_catalog_version()}:{name}'
+    content = cache.get(cache_key)
+    if content is None:
+        # Snapshots are cached under the current version, so they must not
+        # be built from a replica that has not caught up yet.
+        with use_primary():
+            content = gzip.compress(render())
+        cache.set(cache_key, content, settings.CATALOG_SNAPSHOT_TIMEOUT)
+    return content
+
+
+class IngredientAutocomplete:
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.index = ((), ())
+
+    def get_index(self):
+        version = get_catalog_version()
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    with use_primary():
+                        ingredients = sorted(
+                            Ingredient.objects.all(),
+                            key=lambda ingredient: ingredient.name.casefold(),
+                        )
+                    self.index = (
+                        tuple(
+                            ingredient.name.casefold()
+                            for ingredient in ingredients
+                        ),
+                        tuple(ingredients),
+                    )
+                    self.version = version
+        return self.index
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        keys, ingredients = self.get_index()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and end - start < limit:
+            if not keys[end].startswith(query):
+                break
+            end += 1
+        results = list(ingredients[start:end])
+        if not query or len(results) == limit:
+            return results
+        for position, key in enumerate(keys):
+            if len(results) == limit:
+                break
+            if query in key and not key.startswith(query):
+                results.append(ingredients[position])
+        return results
+
+
+ingredient_autocomplete = IngredientAutocomplete()
@@ -0,0 +1,86 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models.sql import Query
+
+TABLE_VERSION_KEY = 'count:table:{}'
+
+
+def get_table_versions(tables):
+    keys = [TABLE_VERSION_KEY.format(table) for table in sorted(tables)]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return ':'.join(versions[key] for key in keys)
+
+
+def bump_table_versions(*tables):
+    cache.delete_many([TABLE_VERSION_KEY.format(table) for table in tables])
+
+
+def get_query_tables(query):
+    tables = {query.model._meta.db_table}
+    tables.update(join.table_name for join in query.alias_map.values())
+    expressions = [query.where]
+    while expressions:
+        expression = expressions.pop()
+        if isinstance(expression, Query):
+            tables |= get_query_tables(expression)
+        elif hasattr(expression, 'get_source_expressions'):
+            expressions.extend(
+                filter(None, expression.get_source_expressions()),
+            )
+        if isinstance(getattr(expression, 'rhs', None), Query):
+            tables |= get_query_tables(expression.rhs)
+    return tables
+
+
+def exact_count(queryset):
+    return queryset.count()
+
+
+def cached_count(queryset):
+    query = queryset.order_by().values('pk').query
+    # Compiling sets up the joins, so the tables are read afterwards.
+    sql, params = query.sql_with_params()
+    tables = get_query_tables(query)
+    cache_key = 'count:{}:{}'.format(
+        md5(repr((sql, params)).encode()).hexdigest(),
+        md5(get_table_versions(tables).encode()).hexdigest(),
+    )
+    return cache.get_or_set(
+        cache_key,
+        lambda: queryset.count(),
+        settings.PAGINATION_COUNT_CACHE_TIMEOUT,
+    )
+
+
+def estimated_count(queryset):
+    connection = connections[queryset.db]
+    if (
+        connection.vendor != 'postgresql'
+        or queryset.query.where
+        or queryset.query.distinct
+    ):
+        return cached_count(queryset)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            (queryset.model._meta.db_table,),
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.PAGINATION_ESTIMATE_THRESHOLD:
+        return cached_count(queryset)
+    return row[0]
+
+
+COUNT_STRATEGIES = {
+    'exact': exact_count,
+    'cached': cached_count,
+    'estimate': estimated_count,
+}
@@ -1,7 +1,20 @@
 from django_filters.rest_framework import CharFilter, FilterSet, filters
+from rest_framework.exceptions import ValidationError
 
+from api.pagination import RecipePagination
+from api.pantry import pantry_index
 from recipies.models import Ingredient, Recipe, Tag
 
+TAGS_MODES = (
+    ('any', 'Любой из тегов'),
+    ('all', 'Все теги'),
+)
+SEARCH_WITH_CURSOR_MESSAGE = 'Поиск нельзя совмещать с параметром cursor'
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
 
 class IngredientFilter(FilterSet):
     name = CharFilter(lookup_expr='istartswith')
@@ -16,12 +29,57 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='get_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='get_tags_mode',
     )
+    search = filters.CharFilter(method='get_search')
+    ingredients = NumberInFilter(method='get_ingredients')
+    exclude_ingredients = NumberInFilter(method='get_exclude_ingredients')
+    pantry = NumberInFilter(method='get_pantry')
+    missing = filters.NumberFilter(method='get_missing', min_value=0)
     is_favorited = filters.BooleanFilter(method='get_is_favorite')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
     )
 
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        lookup = (
+            'tag_ids__contains'
+            if self.form.cleaned_data.get('tags_mode') == 'all'
+            else 'tag_ids__overlap'
+        )
+        return queryset.filter(**{lookup: [tag.id for tag in value]})
+
+    def get_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def get_search(self, queryset, name, value):
+        if RecipePagination.cursor_query_param in self.request.query_params:
+            # Cursor pages are ordered by date and would drop the rank.
+            raise ValidationError({name: [SEARCH_WITH_CURSOR_MESSAGE]})
+        return queryset.search(value)
+
+    def get_ingredients(self, queryset, name, value):
+        return pantry_index.filter(queryset, include=value)
+
+    def get_exclude_ingredients(self, queryset, name, value):
+        return pantry_index.filter(queryset, exclude=value)
+
+    def get_pantry(self, queryset, name, value):
+        return pantry_index.filter(
+            queryset,
+            pantry=value,
+            missing=int(self.form.cleaned_data.get('missing') or 0),
+        )
+
+    def get_missing(self, queryset, name, value):
+        return queryset
+
     def get_is_favorite(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
@@ -36,4 +94,15 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author',
+            'tags',
+            'tags_mode',
+            'search',
+            'ingredients',
+            'exclude_ingredients',
+            'pantry',
+            'missing',
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
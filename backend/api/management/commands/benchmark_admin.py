@@ -0,0 +1,173 @@
+from statistics import median
+from time import perf_counter
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.management.utils import test_database
+from recipies.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                             ShoppingList, Tag)
+from users.models import Subscription, User
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a large test database and measures how long every admin '
+        'changelist takes to render.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100_000,
+            help='Number of favorites, cart rows and subscriptions to seed',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of timed requests per changelist',
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            self.seed(options['rows'])
+            client = Client()
+            client.force_login(
+                User.objects.create_superuser(
+                    username='admin',
+                    email='admin@example.com',
+                    password='admin-password',
+                ),
+            )
+            for url in self.get_urls():
+                self.benchmark(client, url, options['repeat'])
+
+    def benchmark(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                response = client.get(url)
+                timings.append(perf_counter() - started)
+        self.stdout.write(
+            f'{url:<52} status={response.status_code} '
+            f'queries={len(queries.captured_queries):<3} '
+            f'median={median(timings) * 1000:.1f}ms',
+        )
+
+    @staticmethod
+    def get_urls():
+        urls = []
+        for model in admin.site._registry:
+            changelist = reverse(
+                f'admin:{model._meta.app_label}_'
+                f'{model._meta.model_name}_changelist',
+            )
+            urls.append(changelist)
+            urls.append(f'{changelist}?q=user1')
+        recipes = reverse('admin:recipies_recipe_changelist')
+        favorites = reverse('admin:recipies_favorite_changelist')
+        subscriptions = reverse('admin:users_subscription_changelist')
+        urls.extend(
+            (
+                f'{recipes}?author=user1',
+                f'{favorites}?user=user1',
+                f'{favorites}?recipe=recipe 1',
+                f'{subscriptions}?author=user1',
+            ),
+        )
+        return urls
+
+    @staticmethod
+    def seed(rows):
+        users_count = max(rows // 100, 10)
+        recipes_count = max(rows // 10, 10)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f'user{i}',
+                    email=f'user{i}@example.com',
+                    first_name='Имя',
+                    last_name=str(i),
+                )
+                for i in range(users_count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag {i}', color=f'#{i:06x}', slug=f'tag-{i}')
+            for i in range(10)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=f'ingredient {i}', measurement_unit='г')
+                for i in range(2000)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=users[i % users_count],
+                    name=f'recipe {i}',
+                    text='text',
+                    image='recipies/images/benchmark.png',
+                    cooking_time=10,
+                )
+                for i in range(recipes_count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(
+                    recipe=recipe,
+                    tag=tags[i % len(tags)],
+                )
+                for i, recipe in enumerate(recipes)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        IngredientAmount.objects.bulk_create(
+            (
+                IngredientAmount(
+                    recipe=recipe,
+                    ingredient=ingredients[(i + j) % len(ingredients)],
+                    amount=j + 1,
+                )
+                for i, recipe in enumerate(recipes)
+                for j in range(3)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        for model in (Favorite, ShoppingList):
+            model.objects.bulk_create(
+                (
+                    model(
+                        user=users[i % users_count],
+                        recipe=recipes[i // users_count % recipes_count],
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        Subscription.objects.bulk_create(
+            (
+                Subscription(
+                    user=users[i % users_count],
+                    author=users[(i // users_count + 1 + i) % users_count],
+                )
+                for i in range(rows)
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,170 @@
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.test.utils import CaptureQueriesContext
+
+from api.management.utils import test_database
+from api.serializers import RecipePostSerializer
+from api.signals import ingredient_amount_changed
+from recipies.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@contextmanager
+def without_ingredient_signals():
+    # clear() was a single DELETE before ingredient rows had receivers,
+    # m2m_changed still refreshes the recipe once.
+    for signal in (post_save, post_delete):
+        signal.disconnect(ingredient_amount_changed, sender=IngredientAmount)
+    try:
+        yield
+    finally:
+        for signal in (post_save, post_delete):
+            signal.connect(ingredient_amount_changed, sender=IngredientAmount)
+
+
+class WriteCounter:
+    def __init__(self):
+        self.cursors = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().split(None, 1)[0].upper() in WRITE_STATEMENTS:
+            self.cursors.append(context['cursor'])
+        return execute(sql, params, many, context)
+
+    @property
+    def statements(self):
+        return len(self.cursors)
+
+    @property
+    def rows(self):
+        # INSERT ... RETURNING reports its rowcount once rows are fetched.
+        return sum(max(cursor.rowcount, 0) for cursor in self.cursors)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a recipe with many ingredients and reports how many rows '
+        'every kind of edit writes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=200,
+            help='Number of ingredients in the edited recipe',
+        )
+
+    def handle(self, *args, **options):
+        size = options['ingredients']
+        with test_database():
+            recipe, tags, ingredients = self.seed(size)
+            base = {
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'tags': [tag.id for tag in tags[:2]],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 1}
+                    for ingredient in ingredients[:size]
+                ],
+            }
+            for name, data in self.get_scenarios(base, tags, ingredients):
+                for method in (self.update, self.clear_and_recreate):
+                    self.reset(recipe, base)
+                    self.benchmark(name, method, recipe, data)
+
+    def benchmark(self, name, method, recipe, data):
+        writes = WriteCounter()
+        with connection.execute_wrapper(writes), CaptureQueriesContext(
+            connection,
+        ) as queries:
+            started = perf_counter()
+            method(recipe, data)
+            elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{name:<16} {method.__name__:<18} '
+            f'queries={len(queries.captured_queries):<4} '
+            f'writes={writes.statements:<3} rows={writes.rows:<5} '
+            f'time={elapsed * 1000:.1f}ms',
+        )
+
+    @staticmethod
+    def get_scenarios(base, tags, ingredients):
+        size = len(base['ingredients'])
+        one_amount = [dict(item) for item in base['ingredients']]
+        one_amount[0]['amount'] = 2
+        swapped = base['ingredients'][5:] + [
+            {'id': ingredient.id, 'amount': 1}
+            for ingredient in ingredients[size:size + 5]
+        ]
+        replaced = [
+            {'id': ingredient.id, 'amount': 3}
+            for ingredient in ingredients[size:]
+        ]
+        return (
+            ('text only', {**base, 'text': 'Новый текст'}),
+            ('one amount', {**base, 'ingredients': one_amount}),
+            ('swap five', {**base, 'ingredients': swapped}),
+            ('new tag', {**base, 'tags': [tags[0].id, tags[2].id]}),
+            ('replace all', {**base, 'ingredients': replaced}),
+        )
+
+    @staticmethod
+    def update(recipe, data):
+        serializer = RecipePostSerializer(recipe, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    @staticmethod
+    def clear_and_recreate(recipe, data):
+        serializer = RecipePostSerializer(recipe, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        validated_data = dict(serializer.validated_data)
+        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients')
+        with transaction.atomic(), without_ingredient_signals():
+            recipe.ingredients.clear()
+            recipe.tags.clear()
+            recipe.tags.set(tags)
+            RecipePostSerializer.create_ingredients(recipe, ingredients)
+            for field, value in validated_data.items():
+                setattr(recipe, field, value)
+            recipe.save()
+
+    def reset(self, recipe, base):
+        self.clear_and_recreate(recipe, base)
+        recipe.refresh_from_db()
+
+    @staticmethod
+    def seed(size):
+        author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='author-password',
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag {i}', color=f'#{i:06x}', slug=f'tag-{i}')
+            for i in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {i}', measurement_unit='г')
+            for i in range(size * 2)
+        )
+        recipe = Recipe.objects.create(
+            author=author,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+        )
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients[:size]
+        )
+        return recipe, tags, ingredients
@@ -0,0 +1,154 @@
+from statistics import median, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api.management.utils import test_database
+from recipies.models import Ingredient, IngredientAmount, Recipe
+from users.models import User
+
+BATCH_SIZE = 5000
+DISHES = (
+    'суп', 'салат', 'пирог', 'рагу', 'омлет', 'каша', 'запеканка',
+    'паста', 'плов', 'шашлык', 'котлеты', 'блины', 'оладьи', 'соус',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'летний', 'острый', 'сырный', 'овощной',
+    'грибной', 'рыбный', 'мясной', 'постный', 'праздничный', 'детский',
+)
+INGREDIENTS = (
+    'картофель', 'морковь', 'лук', 'чеснок', 'говядина', 'курица',
+    'свинина', 'лосось', 'треска', 'рис', 'гречка', 'мука', 'яйца',
+    'молоко', 'сливки', 'сыр', 'томаты', 'огурцы', 'перец', 'грибы',
+    'шпинат', 'базилик', 'укроп', 'петрушка', 'кинза', 'лимон',
+    'имбирь', 'мед', 'сахар', 'соль',
+)
+RARE_WORD = 'тамаринд'
+RARE_EVERY = 10_000
+QUERIES = (
+    RARE_WORD,
+    'суп',
+    'курица',
+    'острый суп',
+    'грибной плов с рисом',
+    'лосось -сливки',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a large test database and measures the latency of the '
+        'recipe full-text search.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1_000_000,
+            help='Number of recipes to seed',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed requests per query',
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            self.seed(options['recipes'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            self.stdout.write(
+                Recipe.objects.search(RARE_WORD)[:10].explain(),
+            )
+            client = Client()
+            for query in QUERIES:
+                self.benchmark_queryset(query, options['repeat'])
+                self.benchmark_request(client, query, options['repeat'])
+
+    def benchmark_queryset(self, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            recipes = list(Recipe.objects.search(query)[:10])
+            timings.append(perf_counter() - started)
+        self.report('page', query, timings, f'found={len(recipes)}')
+
+    def benchmark_request(self, client, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                response = client.get('/api/recipes/', {'search': query})
+                timings.append(perf_counter() - started)
+        self.report(
+            'request',
+            query,
+            timings,
+            f'status={response.status_code} '
+            f'count={response.json()["count"]} '
+            f'queries={len(queries.captured_queries)}',
+        )
+
+    def report(self, name, query, timings, details):
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f'{name:<8} {query:<24} '
+            f'median={median(timings) * 1000:>7.1f}ms '
+            f'p99={percentiles[98] * 1000:>7.1f}ms {details}',
+        )
+
+    @staticmethod
+    def seed(recipes_count):
+        author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in INGREDIENTS + (RARE_WORD,)
+        )
+        for start in range(0, recipes_count, BATCH_SIZE):
+            recipes = []
+            amounts = []
+            for i in range(start, min(start + BATCH_SIZE, recipes_count)):
+                chosen = [
+                    ingredients[(i * 7 + j * 11) % len(INGREDIENTS)]
+                    for j in range(5)
+                ]
+                if i % RARE_EVERY == 0:
+                    chosen.append(ingredients[-1])
+                chosen = list(dict.fromkeys(chosen))
+                recipe = Recipe(
+                    author=author,
+                    name=(
+                        f'{ADJECTIVES[i % len(ADJECTIVES)]} '
+                        f'{DISHES[i // len(ADJECTIVES) % len(DISHES)]} {i}'
+                    ),
+                    text=' '.join(
+                        INGREDIENTS[(i + j) % len(INGREDIENTS)]
+                        for j in range(20)
+                    ),
+                    search_ingredients=' '.join(
+                        sorted(ingredient.name for ingredient in chosen),
+                    ),
+                    image='recipies/images/benchmark.png',
+                    cooking_time=10,
+                )
+                recipes.append(recipe)
+                amounts.extend(
+                    IngredientAmount(
+                        recipe=recipe,
+                        ingredient=ingredient,
+                        amount=1,
+                    )
+                    for ingredient in chosen
+                )
+            Recipe.objects.bulk_create(recipes)
+            IngredientAmount.objects.bulk_create(amounts)
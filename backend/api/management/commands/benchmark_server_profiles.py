@@ -0,0 +1,152 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from itertools import count
+from statistics import quantiles
+from threading import Lock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ('wsgi', 'asgi')
+ROUTES = (
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%BA',
+    '/api/recipes/',
+    '/api/recipes/?limit=20',
+)
+SUBSCRIPTIONS_ROUTE = '/api/users/subscriptions/?recipes_limit=3'
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts the WSGI and ASGI server profiles with the same number of '
+        'workers against the configured database and compares throughput '
+        'and p99 latency of the read endpoints.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='More than one worker needs a shared cache backend',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Number of simultaneous client connections',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Number of requests per profile and route',
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--token',
+            type=str,
+            help='Auth token, also benchmarks subscriptions when given',
+        )
+
+    def handle(self, *args, **options):
+        routes = ROUTES
+        headers = {}
+        if options['token']:
+            routes += (SUBSCRIPTIONS_ROUTE,)
+            headers['Authorization'] = f'Token {options["token"]}'
+        for profile in PROFILES:
+            with self.run_server(profile, options) as port:
+                for route in routes:
+                    self.benchmark(profile, port, route, headers, options)
+
+    @contextmanager
+    def run_server(self, profile, options):
+        port = options['port']
+        env = {
+            **os.environ,
+            'SERVER_PROFILE': profile,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(options['workers']),
+            'ALLOWED_HOSTS': '127.0.0.1,localhost',
+        }
+        # Each profile picks its own views, asgi turns the async ones on.
+        env.pop('ASYNC_READ_VIEWS', None)
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                '-m',
+                'gunicorn',
+                '--config',
+                str(settings.BASE_DIR / 'gunicorn.conf.py'),
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_server(server, port)
+            yield port
+        finally:
+            server.terminate()
+            server.wait()
+
+    @staticmethod
+    def wait_for_server(server, port):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('Server exited during startup')
+            try:
+                connection = HTTPConnection('127.0.0.1', port, timeout=1)
+                connection.request('GET', ROUTES[0])
+                connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('Server did not start in time')
+
+    def benchmark(self, profile, port, route, headers, options):
+        counter = count()
+        lock = Lock()
+        latencies = []
+        errors = []
+
+        def worker():
+            connection = HTTPConnection('127.0.0.1', port, timeout=30)
+            while next(counter) < options['requests']:
+                started = time.perf_counter()
+                connection.request('GET', route, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status != 200:
+                        errors.append(response.status)
+            connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for future in [
+                pool.submit(worker) for _ in range(options['concurrency'])
+            ]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        percentiles = quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{profile:<5} {route:<44} '
+            f'rps={len(latencies) / elapsed:>8.1f} '
+            f'p50={percentiles[49] * 1000:>7.1f}ms '
+            f'p99={percentiles[98] * 1000:>7.1f}ms '
+            f'errors={len(errors)}',
+        )
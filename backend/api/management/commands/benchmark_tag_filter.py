@@ -0,0 +1,127 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.management.utils import test_database
+from recipies.models import Recipe, Tag
+from users.models import User
+
+BATCH_SIZE = 5000
+TAGS_COUNT = 10
+PAGE_SIZE = 6
+SCENARIOS = (
+    ('any', 2),
+    ('any', 5),
+    ('all', 2),
+    ('all', 3),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a large test database and compares filtering recipes by '
+        'several tags through the tags join and through Recipe.tag_ids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=200_000,
+            help='Number of recipes to seed',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs per query',
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            tags = self.seed(options['recipes'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            for mode, size in SCENARIOS:
+                chosen = tags[:size]
+                for name, queryset in (
+                    ('join', self.join_queryset(mode, chosen)),
+                    ('tag_ids', self.array_queryset(mode, chosen)),
+                ):
+                    self.benchmark(
+                        f'{mode} of {size}',
+                        name,
+                        queryset,
+                        options['repeat'],
+                    )
+
+    @staticmethod
+    def join_queryset(mode, tags):
+        if mode == 'any':
+            return Recipe.objects.filter(
+                tags__slug__in=[tag.slug for tag in tags],
+            ).distinct()
+        queryset = Recipe.objects.all()
+        for tag in tags:
+            queryset = queryset.filter(tags__slug=tag.slug)
+        return queryset
+
+    @staticmethod
+    def array_queryset(mode, tags):
+        lookup = 'tag_ids__contains' if mode == 'all' else 'tag_ids__overlap'
+        return Recipe.objects.filter(**{lookup: [tag.id for tag in tags]})
+
+    def benchmark(self, scenario, name, queryset, repeat):
+        count_timings = []
+        page_timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            count = queryset.count()
+            count_timings.append(perf_counter() - started)
+            started = perf_counter()
+            page = list(queryset.values_list('id', flat=True)[:PAGE_SIZE])
+            page_timings.append(perf_counter() - started)
+        self.stdout.write(
+            f'{scenario:<10} {name:<8} count={count:<8} '
+            f'count_time={median(count_timings) * 1000:>8.1f}ms '
+            f'page_time={median(page_timings) * 1000:>8.1f}ms '
+            f'page={len(page)}',
+        )
+
+    @staticmethod
+    def seed(recipes_count):
+        author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag {i}', color=f'#{i:06x}', slug=f'tag-{i}')
+            for i in range(TAGS_COUNT)
+        )
+        for start in range(0, recipes_count, BATCH_SIZE):
+            recipes = []
+            recipe_tags = []
+            for i in range(start, min(start + BATCH_SIZE, recipes_count)):
+                chosen = {
+                    tags[(i * (j + 3) + j) % TAGS_COUNT]
+                    for j in range(1 + i % 3)
+                }
+                recipe = Recipe(
+                    author=author,
+                    name=f'recipe {i}',
+                    text='text',
+                    image='recipies/images/benchmark.png',
+                    cooking_time=10,
+                    tag_ids=[tag.id for tag in chosen],
+                )
+                recipes.append(recipe)
+                recipe_tags.extend(
+                    Recipe.tags.through(recipe=recipe, tag=tag)
+                    for tag in chosen
+                )
+            Recipe.objects.bulk_create(recipes)
+            Recipe.tags.through.objects.bulk_create(recipe_tags)
+        return tags
@@ -0,0 +1,184 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.counts import COUNT_STRATEGIES, cached_count
+from api.management.utils import test_database
+from recipies.feed import rebuild_feeds
+from recipies.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                             ShoppingList, Tag)
+from users.models import Subscription, User
+
+PAGE_SIZES = (1, 10, 100)
+INGREDIENTS_PER_RECIPE = 5
+TAGS_PER_RECIPE = 2
+
+# Queries of an authenticated request with cold caches, the same for
+# every page size.
+QUERY_BUDGET = {
+    'tags-list': 1,
+    'tags-detail': 1,
+    'ingredients-list': 1,
+    'ingredients-detail': 1,
+    'recipes-list': 5,
+    'recipes-detail': 4,
+    'recipes-feed': 4,
+    'recipes-download-shopping-cart': 1,
+    'users-list': 3,
+    'users-detail': 2,
+    'users-me': 1,
+    'users-subscriptions': 3,
+}
+# Estimates read pg_class first on PostgreSQL only. The budgets count
+# the cached count every other backend falls back to.
+BUDGET_COUNT_STRATEGIES = {'estimate': cached_count}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a test database and checks that every API read endpoint '
+        'stays within its SQL query budget at several page sizes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default=','.join(map(str, PAGE_SIZES)),
+            help='Comma separated page sizes to check',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with test_database(), patch.dict(
+            COUNT_STRATEGIES,
+            BUDGET_COUNT_STRATEGIES,
+        ):
+            failures = self.check_budget(sizes)
+
+        if failures:
+            raise CommandError(
+                'Query budget exceeded:\n' + '\n'.join(failures),
+            )
+        self.stdout.write(self.style.SUCCESS('All routes within budget.'))
+
+    def check_budget(self, sizes):
+        failures = []
+        for size in sizes:
+            cache.clear()
+            with transaction.atomic():
+                user, recipe, author = self.seed(size)
+                client = APIClient()
+                client.force_authenticate(user)
+                for route, url in self.get_routes(size, recipe, author):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = client.get(url)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    count = len(queries.captured_queries)
+                    self.stdout.write(
+                        f'{route:<32} size={size:<4} queries={count}',
+                    )
+                    if response.status_code != 200:
+                        failures.append(
+                            f'{route} size={size}: '
+                            f'HTTP {response.status_code}',
+                        )
+                    elif count > QUERY_BUDGET[route]:
+                        failures.append(
+                            f'{route} size={size}: {count} queries, '
+                            f'budget {QUERY_BUDGET[route]}',
+                        )
+                transaction.set_rollback(True)
+        return failures
+
+    @staticmethod
+    def get_routes(size, recipe, author):
+        return (
+            ('tags-list', '/api/tags/'),
+            ('tags-detail', f'/api/tags/{recipe.tags.first().id}/'),
+            ('ingredients-list', '/api/ingredients/'),
+            (
+                'ingredients-detail',
+                f'/api/ingredients/{recipe.ingredients.first().id}/',
+            ),
+            ('recipes-list', f'/api/recipes/?limit={size}'),
+            ('recipes-detail', f'/api/recipes/{recipe.id}/'),
+            ('recipes-feed', f'/api/recipes/feed/?limit={size}'),
+            (
+                'recipes-download-shopping-cart',
+                '/api/recipes/download_shopping_cart/',
+            ),
+            ('users-list', f'/api/users/?limit={size}'),
+            ('users-detail', f'/api/users/{author.id}/'),
+            ('users-me', '/api/users/me/'),
+            (
+                'users-subscriptions',
+                f'/api/users/subscriptions/?limit={size}&recipes_limit=3',
+            ),
+        )
+
+    @staticmethod
+    def seed(size):
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag {i}', color=f'#{i:06x}', slug=f'tag-{i}')
+            for i in range(max(size, TAGS_PER_RECIPE))
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {i}', measurement_unit='г')
+            for i in range(max(size, INGREDIENTS_PER_RECIPE))
+        )
+        user = User.objects.create_user(
+            username='budget',
+            email='budget@example.com',
+            password='budget-password',
+        )
+        authors = User.objects.bulk_create(
+            User(
+                username=f'author{i}',
+                email=f'author{i}@example.com',
+                first_name='Автор',
+                last_name=str(i),
+            )
+            for i in range(size)
+        )
+        recipes = []
+        for i, author in enumerate(authors):
+            for number in range(2):
+                recipes.append(
+                    Recipe.objects.create(
+                        author=author,
+                        name=f'recipe {i}.{number}',
+                        text='text',
+                        image='recipies/images/budget.png',
+                        cooking_time=10,
+                    ),
+                )
+        for i, recipe in enumerate(recipes):
+            recipe.tags.set(
+                tags[(i + j) % len(tags)] for j in range(TAGS_PER_RECIPE)
+            )
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe,
+                ingredient=ingredients[(i + j) % len(ingredients)],
+                amount=j + 1,
+            )
+            for i, recipe in enumerate(recipes)
+            for j in range(INGREDIENTS_PER_RECIPE)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+        )
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=user, recipe=recipe) for recipe in recipes
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author) for author in authors
+        )
+        rebuild_feeds([user.id])
+        return user, recipes[0], authors[0]
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipies.images import generate_variants_in_worker
+from recipies.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generates resized and WebP copies of recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.RECIPE_IMAGE_WORKERS,
+            help='Number of images processed in parallel',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate copies that already exist',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects.exclude(image='').values_list('id', flat=True),
+        )
+
+        generated = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                executor.submit(
+                    generate_variants_in_worker,
+                    recipe_id,
+                    options['force'],
+                ): recipe_id
+                for recipe_id in recipe_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    generated += future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(
+                        f'Recipe {futures[future]}: {error}',
+                    )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Generated: {generated}, skipped: '
+                f'{len(recipe_ids) - generated - failed}, failed: {failed}.',
+            ),
+        )
@@ -1,55 +1,206 @@
 import csv
+from collections import Counter
+from itertools import islice
 from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.catalog import bump_catalog_version
 from recipies.models import Ingredient, Tag
 
+INGREDIENT_FIELDS = ['name', 'measurement_unit']
+PROGRESS_EVERY = 100_000
+COPY_PROGRESS_EVERY = 10 * 1024 * 1024
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+
+class ProgressReader:
+    def __init__(self, file, report):
+        self.file = file
+        self.report = report
+        self.read_bytes = 0
+        self.reported = 0
+
+    def read(self, size=-1):
+        chunk = self.file.read(size)
+        self.read_bytes += len(chunk)
+        if self.read_bytes - self.reported >= COPY_PROGRESS_EVERY:
+            self.reported = self.read_bytes
+            self.report(f'{self.read_bytes // 1024 // 1024} MB copied')
+        return chunk
+
+    def readline(self, size=-1):
+        return self.file.readline(size)
+
 
 class Command(BaseCommand):
+    help = (
+        'Imports ingredients and tags from CSV files. Existing rows are '
+        'kept, so the import can be repeated.'
+    )
+
     def add_arguments(self, parser):
         parser.add_argument('--path', type=str, help='Path to the CSV files')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows written per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing anything',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Do not use PostgreSQL COPY for ingredients',
+        )
 
     def handle(self, *args, **options):
-        csv_path = options['path'] or str(
-            Path(settings.BASE_DIR) / 'data',
-        )
+        csv_path = Path(options['path'] or Path(settings.BASE_DIR) / 'data')
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be positive')
 
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
         self.import_csv_data(
             csv_path,
             'ingredients.csv',
-            self.import_ingredients,
+            self.copy_ingredients if use_copy else self.import_ingredients,
+            'Ingredients',
         )
-        self.stdout.write(
-            self.style.SUCCESS('Ingredients imported successfully.'),
+        self.import_csv_data(
+            csv_path,
+            'tags.csv',
+            self.import_tags,
+            'Tags',
         )
-        self.import_csv_data(csv_path, 'tags.csv', self.import_tags)
-        self.stdout.write(self.style.SUCCESS('Tags imported successfully.'))
+        if not self.dry_run:
+            bump_catalog_version()
 
-    def import_csv_data(self, csv_path, filename, import_func):
+    def import_csv_data(self, csv_path, filename, import_func, title):
         file_path = Path(csv_path) / filename
-        with open(file_path, 'r') as file:
-            csv_data = csv.DictReader(file)
-            import_func(csv_data)
-
-    def import_ingredients(self, csv_data):
-        ingredients = [
-            Ingredient(
-                name=row['name'],
-                measurement_unit=row['measurement_unit'],
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
+            stats = import_func(file)
+        prefix = 'Dry run. ' if self.dry_run else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix}{title}: inserted {stats["inserted"]}, '
+                f'updated {stats["updated"]}, skipped {stats["skipped"]}.',
+            ),
+        )
+
+    def report_progress(self, processed, batch):
+        previous = processed - batch
+        if processed // PROGRESS_EVERY != previous // PROGRESS_EVERY:
+            self.stdout.write(f'{processed} rows processed')
+
+    def import_ingredients(self, file):
+        stats = Counter(inserted=0, updated=0, skipped=0)
+        seen = set()
+        processed = 0
+        for batch in batched(csv.DictReader(file), self.batch_size):
+            keys = {
+                (row['name'].strip(), row['measurement_unit'].strip())
+                for row in batch
+            }
+            existing = set(
+                Ingredient.objects.filter(
+                    name__in={name for name, _ in keys},
+                ).values_list('name', 'measurement_unit'),
             )
-            for row in csv_data
-        ]
-        Ingredient.objects.bulk_create(ingredients)
-
-    def import_tags(self, csv_data):
-        tags = [
-            Tag(
-                name=row['name'],
-                color=row['color'],
-                slug=row['slug'],
+            new = keys - existing - seen
+            if self.dry_run:
+                seen |= new
+            else:
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in new
+                    ),
+                    ignore_conflicts=True,
+                )
+            stats['inserted'] += len(new)
+            stats['skipped'] += len(batch) - len(new)
+            processed += len(batch)
+            self.report_progress(processed, len(batch))
+        return stats
+
+    def copy_ingredients(self, file):
+        header = next(csv.reader([file.readline()]), [])
+        if header != INGREDIENT_FIELDS:
+            file.seek(0)
+            return self.import_ingredients(file)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP',
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                ProgressReader(file, self.stdout.write),
+            )
+            cursor.execute('SELECT count(*) FROM ingredient_import')
+            total = cursor.fetchone()[0]
+            new_rows = (
+                'SELECT DISTINCT trim(name), trim(measurement_unit) '
+                'FROM ingredient_import'
+            )
+            if self.dry_run:
+                cursor.execute(
+                    f'SELECT count(*) FROM ({new_rows}) AS new (name, unit) '
+                    'WHERE NOT EXISTS (SELECT 1 FROM recipies_ingredient i '
+                    'WHERE i.name = new.name '
+                    'AND i.measurement_unit = new.unit)',
+                )
+                inserted = cursor.fetchone()[0]
+                transaction.set_rollback(True)
+            else:
+                cursor.execute(
+                    'INSERT INTO recipies_ingredient (name, measurement_unit) '
+                    f'{new_rows} '
+                    'ON CONFLICT (name, measurement_unit) DO NOTHING',
+                )
+                inserted = cursor.rowcount
+        return Counter(inserted=inserted, updated=0, skipped=total - inserted)
+
+    def import_tags(self, file):
+        stats = Counter(inserted=0, updated=0, skipped=0)
+        for batch in batched(csv.DictReader(file), self.batch_size):
+            existing = Tag.objects.in_bulk(
+                [row['slug'] for row in batch],
+                field_name='slug',
             )
-            for row in csv_data
-        ]
-        Tag.objects.bulk_create(tags)
+            new, changed = {}, []
+            for row in batch:
+                tag = existing.get(row['slug'])
+                if tag is None:
+                    new[row['slug']] = Tag(
+                        name=row['name'],
+                        color=row['color'],
+                        slug=row['slug'],
+                    )
+                elif (tag.name, tag.color) != (row['name'], row['color']):
+                    tag.name, tag.color = row['name'], row['color']
+                    changed.append(tag)
+                else:
+                    stats['skipped'] += 1
+            if not self.dry_run:
+                Tag.objects.bulk_create(new.values(), ignore_conflicts=True)
+                Tag.objects.bulk_update(changed, ('name', 'color'))
+            stats['inserted'] += len(new)
+            stats['updated'] += len(changed)
+        return stats
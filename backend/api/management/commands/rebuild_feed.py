@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.counts import bump_table_versions
+from recipies.feed import rebuild_feeds
+from recipies.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized followed-authors feed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Rebuild only the feed of this user id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_feeds(options['users'])
+        bump_table_versions(FeedItem._meta.db_table)
+        self.stdout.write(
+            self.style.SUCCESS(f'Feed rebuilt, {created} items created.'),
+        )
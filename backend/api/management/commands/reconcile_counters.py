@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipies.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Repairs drifted favorites, shopping cart, recipes and followers '
+        'counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many counters have drifted',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(dry_run=options['dry_run'])
+        verb = 'drifted' if options['dry_run'] else 'repaired'
+        for counter, rows in drift.items():
+            self.stdout.write(f'{counter}: {rows} {verb}')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled.'))
@@ -1,5 +1,186 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.counts import COUNT_STRATEGIES
+
+
+class CountStrategyPaginator(Paginator):
+    def __init__(self, *args, count_strategy='exact', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_strategy = COUNT_STRATEGIES[count_strategy]
+
+    @cached_property
+    def count(self):
+        return self.count_strategy(self.object_list)
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountStrategyPaginator,
+            count_strategy=getattr(view, 'count_strategy', 'exact'),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # The page paginate_queryset would return, read by the async ORM.
+        # Count strategies may go through the cache, they stay sync.
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        count_strategy = getattr(view, 'count_strategy', 'exact')
+        paginator = CountStrategyPaginator(
+            queryset,
+            page_size,
+            count_strategy=count_strategy,
+        )
+        paginator.count = await sync_to_async(
+            COUNT_STRATEGIES[count_strategy],
+        )(queryset)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number,
+                    message=str(exc),
+                ),
+            )
+        bottom = (number - 1) * page_size
+        self.page = paginator._get_page(
+            [item async for item in queryset[bottom:bottom + page_size]],
+            number,
+            paginator,
+        )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+class RecipePagination(CustomPagination):
+    cursor_query_param = 'cursor'
+    cursor_fields = ('pub_date', 'id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        return self.get_cursor_page(
+            list(self.get_cursor_queryset(queryset, request)),
+        )
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return await super().apaginate_queryset(queryset, request, view)
+        return self.get_cursor_page(
+            [
+                item
+                async for item in self.get_cursor_queryset(queryset, request)
+            ],
+        )
+
+    def get_cursor_queryset(self, queryset, request):
+        self.request = request
+        self.cursor_page_size = self.get_page_size(request)
+        cursor = self.cursor = self.decode_cursor(
+            request.query_params[self.cursor_query_param],
+        )
+        reverse = cursor is not None and cursor[2]
+        date_field, id_field = self.cursor_fields
+        if cursor is not None:
+            pub_date, pk = cursor[:2]
+            if reverse:
+                queryset = queryset.filter(
+                    **{f'{date_field}__gte': pub_date},
+                ).filter(
+                    Q(**{f'{date_field}__gt': pub_date})
+                    | Q(**{f'{id_field}__gt': pk}),
+                )
+            else:
+                queryset = queryset.filter(
+                    **{f'{date_field}__lte': pub_date},
+                ).filter(
+                    Q(**{f'{date_field}__lt': pub_date})
+                    | Q(**{f'{id_field}__lt': pk}),
+                )
+        ordering = (
+            (date_field, id_field)
+            if reverse
+            else (f'-{date_field}', f'-{id_field}')
+        )
+        return queryset.order_by(*ordering)[: self.cursor_page_size + 1]
+
+    def get_cursor_page(self, results):
+        cursor = self.cursor
+        reverse = cursor is not None and cursor[2]
+        has_more = len(results) > self.cursor_page_size
+        results = results[: self.cursor_page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None and bool(results)
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                'next': self.get_cursor_link(-1, False, self.has_next),
+                'previous': self.get_cursor_link(0, True, self.has_previous),
+                'results': data,
+            },
+        )
+
+    def get_cursor_link(self, position, reverse, exists):
+        if not exists or not self.results:
+            return None
+        date_field, id_field = self.cursor_fields
+        item = self.results[position]
+        cursor = urlsafe_b64encode(
+            json.dumps(
+                [
+                    getattr(item, date_field).isoformat(),
+                    getattr(item, id_field),
+                    reverse,
+                ],
+            ).encode(),
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(),
+            self.page_query_param,
+        )
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            pub_date, pk, reverse = json.loads(urlsafe_b64decode(encoded))
+            return datetime.fromisoformat(pub_date), int(pk), bool(reverse)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class FeedPagination(RecipePagination):
+    cursor_fields = ('pub_date', 'recipe_id')
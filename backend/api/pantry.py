@@ -0,0 +1,283 @@
+import json
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache, reduce
+from operator import or_
+from threading import Lock
+from time import monotonic
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from foodgram.replicas import use_primary
+from recipies.models import IngredientAmount, Recipe, RecipeChange
+
+PANTRY_MAX_CHANGES = 1000
+PANTRY_GAP_TIMEOUT = 60
+PANTRY_BITSETS_CACHED = 64
+
+
+def record_recipe_changes(recipe_ids):
+    # Written in the caller's transaction, the log is shared by every
+    # worker and never runs ahead of the ingredients it points to.
+    changes = RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id) for recipe_id in set(recipe_ids)
+    )
+    if not changes or changes[-1].id is None:
+        return
+    first, latest = changes[0].id, changes[-1].id
+    # Pruned once per PANTRY_MAX_CHANGES rows, not on every write.
+    if (first - 1) // PANTRY_MAX_CHANGES < latest // PANTRY_MAX_CHANGES:
+        RecipeChange.objects.filter(
+            id__lte=latest - PANTRY_MAX_CHANGES,
+        ).delete()
+
+
+def find_gaps(start, end, found, deadline):
+    # Ids of transactions that have not committed yet, or never will.
+    return {
+        change_id: deadline
+        for change_id in range(start + 1, end + 1)
+        if change_id not in found
+    }
+
+
+def to_bitset(recipe_ids):
+    if not recipe_ids:
+        return 0
+    buffer = bytearray(recipe_ids[-1] // 8 + 1)
+    for recipe_id in recipe_ids:
+        buffer[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def from_bitset(bits):
+    digits = bin(bits)[:1:-1]
+    recipe_ids = []
+    position = digits.find('1')
+    while position != -1:
+        recipe_ids.append(position)
+        position = digits.find('1', position + 1)
+    return recipe_ids
+
+
+def count_bits(bits):
+    return bin(bits).count('1')
+
+
+def contains(posting, recipe_id):
+    position = bisect_left(posting, recipe_id)
+    return position < len(posting) and posting[position] == recipe_id
+
+
+def id_in(queryset, recipe_ids):
+    # A single array parameter instead of one placeholder per recipe.
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        return RawSQL('SELECT unnest(%s::bigint[])', (recipe_ids,))
+    if vendor == 'sqlite':
+        return RawSQL(
+            'SELECT value FROM json_each(%s)',
+            (json.dumps(recipe_ids),),
+        )
+    return recipe_ids
+
+
+class PantrySnapshot:
+    def __init__(self, position, gaps, postings, sizes):
+        self.position = position
+        self.gaps = gaps
+        self.postings = postings
+        self.sizes = sizes
+        self.everything = reduce(or_, sizes.values(), 0)
+        self.bitset = lru_cache(PANTRY_BITSETS_CACHED)(self.get_bitset)
+
+    def get_bitset(self, ingredient_id):
+        return to_bitset(self.postings.get(ingredient_id, ()))
+
+    def floor(self):
+        return min(self.gaps, default=self.position + 1) - 1
+
+
+class PantryIndex:
+    def __init__(self):
+        self.lock = Lock()
+        self.snapshot = None
+
+    def build(self):
+        changes = list(
+            RecipeChange.objects.order_by('-id').values_list(
+                'id',
+                flat=True,
+            )[:PANTRY_MAX_CHANGES],
+        )
+        position, oldest = (changes[0], changes[-1]) if changes else (0, 0)
+        # Ids further back may have been pruned already, they are no gaps.
+        gaps = find_gaps(
+            max(oldest, position - PANTRY_MAX_CHANGES),
+            position,
+            set(changes),
+            monotonic() + PANTRY_GAP_TIMEOUT,
+        )
+        postings = defaultdict(lambda: array('q'))
+        sizes = defaultdict(int)
+        for ingredient_id, recipe_id in (
+            IngredientAmount.objects.order_by('ingredient_id', 'recipe_id')
+            .values_list('ingredient_id', 'recipe_id')
+            .iterator(chunk_size=10000)
+        ):
+            postings[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        by_size = defaultdict(list)
+        for recipe_id in Recipe.objects.order_by('id').values_list(
+            'id',
+            flat=True,
+        ).iterator(chunk_size=10000):
+            by_size[sizes[recipe_id]].append(recipe_id)
+        return PantrySnapshot(
+            position,
+            gaps,
+            dict(postings),
+            {
+                size: to_bitset(recipe_ids)
+                for size, recipe_ids in by_size.items()
+            },
+        )
+
+    def apply(self, snapshot, recipe_ids, position, gaps):
+        # Copy on write, queries still running keep the old snapshot.
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in IngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        existing = set(
+            Recipe.objects.filter(id__in=recipe_ids).values_list(
+                'id',
+                flat=True,
+            ),
+        )
+        mask = to_bitset(sorted(recipe_ids))
+        sizes = {
+            size: bits & ~mask
+            for size, bits in snapshot.sizes.items()
+            if bits & ~mask
+        }
+        postings = dict(snapshot.postings)
+        copied = set()
+        for ingredient_id, posting in snapshot.postings.items():
+            if any(contains(posting, recipe_id) for recipe_id in recipe_ids):
+                postings[ingredient_id] = array(
+                    'q',
+                    (
+                        recipe_id
+                        for recipe_id in posting
+                        if recipe_id not in recipe_ids
+                    ),
+                )
+                copied.add(ingredient_id)
+        for recipe_id in existing:
+            for ingredient_id in ingredients[recipe_id]:
+                if ingredient_id not in copied:
+                    postings[ingredient_id] = array(
+                        'q',
+                        postings.get(ingredient_id, ()),
+                    )
+                    copied.add(ingredient_id)
+                insort(postings[ingredient_id], recipe_id)
+            size = len(ingredients[recipe_id])
+            sizes[size] = sizes.get(size, 0) | 1 << recipe_id
+        return PantrySnapshot(position, gaps, postings, sizes)
+
+    def sync(self):
+        # The index is shared by all requests, so it only ever moves
+        # forward along the primary.
+        with use_primary():
+            snapshot = self.snapshot
+            if snapshot is None:
+                with self.lock:
+                    if self.snapshot is None:
+                        self.snapshot = self.build()
+                    return self.snapshot
+            now = monotonic()
+            changes = {
+                change_id: recipe_id
+                for change_id, recipe_id in RecipeChange.objects.filter(
+                    id__gt=snapshot.floor(),
+                ).values_list('id', 'recipe_id')
+                if change_id > snapshot.position or change_id in snapshot.gaps
+            }
+            expired = any(
+                deadline <= now for deadline in snapshot.gaps.values()
+            )
+            if not changes and not expired:
+                return snapshot
+            with self.lock:
+                if self.snapshot is not snapshot:
+                    return self.snapshot
+                position = max((snapshot.position, *changes))
+                gaps = {
+                    change_id: deadline
+                    for change_id, deadline in snapshot.gaps.items()
+                    if change_id not in changes and deadline > now
+                }
+                oldest = min(gaps, default=snapshot.position + 1)
+                if position - oldest >= PANTRY_MAX_CHANGES:
+                    # Changes this far back may have been pruned already.
+                    self.snapshot = self.build()
+                    return self.snapshot
+                gaps.update(
+                    find_gaps(
+                        snapshot.position,
+                        position,
+                        changes,
+                        now + PANTRY_GAP_TIMEOUT,
+                    ),
+                )
+                self.snapshot = self.apply(
+                    snapshot,
+                    set(changes.values()),
+                    position,
+                    gaps,
+                )
+                return self.snapshot
+
+    def query(self, include=(), exclude=(), pantry=None, missing=0):
+        snapshot = self.sync()
+        result = snapshot.everything
+        for ingredient_id in include:
+            result &= snapshot.bitset(ingredient_id)
+        if pantry is not None:
+            pantry = set(pantry)
+            # at_least[count] holds recipes with at least count of their
+            # ingredients in the pantry.
+            at_least = [result] + [0] * len(pantry)
+            for ingredient_id in pantry:
+                bits = snapshot.bitset(ingredient_id)
+                for count in range(len(pantry), 0, -1):
+                    at_least[count] |= at_least[count - 1] & bits
+            cookable = 0
+            for size, bits in snapshot.sizes.items():
+                needed = max(size - missing, 0)
+                if needed <= len(pantry):
+                    cookable |= bits & at_least[needed]
+            result &= cookable
+        for ingredient_id in exclude:
+            result &= ~snapshot.bitset(ingredient_id)
+        return result, snapshot.everything & ~result
+
+    def filter(self, queryset, **kwargs):
+        matched, rest = self.query(**kwargs)
+        if count_bits(matched) <= count_bits(rest):
+            return queryset.filter(
+                id__in=id_in(queryset, from_bitset(matched)),
+            )
+        # Recipes created since the last sync are kept rather than lost.
+        return queryset.filter(
+            ~Q(id__in=id_in(queryset, from_bitset(rest))),
+        )
+
+
+pantry_index = PantryIndex()
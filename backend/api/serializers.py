@@ -1,11 +1,48 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 
+from api.counts import bump_table_versions
+from api.pantry import record_recipe_changes
+from api.shopping_cart import bump_recipe_carts
+from api.utils import get_subscribed_ids
+from foodgram.replicas import use_primary
+from recipies.cache import (cache_recipes, get_cached_recipes,
+                            invalidate_recipes)
+from recipies.images import variants_ready
+from recipies.search import refresh_search_ingredients
 from users.models import Subscription, User
 from recipies.models import (Favorite, Ingredient, IngredientAmount, Recipe,
                              ShoppingList, Tag)
 
+BULK_RECIPES_LIMIT = 100
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return {}
+        request = self.context.get('request')
+        storage = recipe.image.storage
+        ready = variants_ready(recipe)
+        variants = {}
+        for name in settings.RECIPE_IMAGE_VARIANTS:
+            for key in (name, f'{name}_webp'):
+                url = storage.url(
+                    recipe.image_variants[key] if ready else recipe.image.name,
+                )
+                variants[key] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+        return variants
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,18 +83,22 @@ class UserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
         read_only_fields = (
             'is_subscribed',
             'id',
+            'recipes_count',
+            'followers_count',
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request').user
+        request = self.context.get('request')
 
         return (
-            request.is_authenticated
-            and Subscription.objects.filter(user=request, author=obj).exists()
+            request.user.is_authenticated
+            and obj.id in get_subscribed_ids(request)
         )
 
 
@@ -82,6 +123,73 @@ class IngredientAmountGetSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class SharedRecipeSerializer(serializers.ModelSerializer):
+    tags = TagSerializer(many=True, read_only=True)
+    ingredients = IngredientAmountGetSerializer(
+        many=True,
+        read_only=True,
+        source='ingredient_amount',
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('tags', 'ingredients')
+
+
+def load_recipe_representations(recipes):
+    # Only the parts that cost queries of their own are cached, they are
+    # the same for every user and host.
+    recipes = [
+        recipe
+        for recipe in recipes
+        if not hasattr(recipe, 'shared_representation')
+    ]
+    if not recipes:
+        return
+    representations = get_cached_recipes([recipe.id for recipe in recipes])
+    missing = [
+        recipe for recipe in recipes if recipe.id not in representations
+    ]
+    if missing:
+        with use_primary():
+            if any(recipe._state.db != DEFAULT_DB_ALIAS for recipe in missing):
+                # Rows of a lagging replica would put what was just
+                # invalidated back into the cache.
+                missing = list(
+                    Recipe.objects.filter(
+                        id__in=[recipe.id for recipe in missing],
+                    ),
+                )
+            prefetch_related_objects(
+                missing,
+                'tags',
+                Prefetch(
+                    'ingredient_amount',
+                    queryset=IngredientAmount.objects.select_related(
+                        'ingredient',
+                    ),
+                ),
+            )
+        rendered = {
+            recipe.id: SharedRecipeSerializer(recipe).data
+            for recipe in missing
+        }
+        cache_recipes(rendered)
+        representations.update(rendered)
+    for recipe in recipes:
+        if recipe.id not in representations:
+            # Already deleted on the primary, nothing worth caching.
+            representations[recipe.id] = SharedRecipeSerializer(recipe).data
+        recipe.shared_representation = representations[recipe.id]
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        load_recipe_representations(recipes)
+        return super().to_representation(recipes)
+
+
 class RecipeGetSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
@@ -93,9 +201,11 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
+        list_serializer_class = RecipeListSerializer
         fields = (
             'id',
             'tags',
@@ -105,11 +215,33 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
+            'favorites_count',
+            'shopping_cart_count',
         )
 
+    @property
+    def _readable_fields(self):
+        for field in super()._readable_fields:
+            if field.field_name not in SharedRecipeSerializer.Meta.fields:
+                yield field
+
+    def to_representation(self, instance):
+        load_recipe_representations([instance])
+        representation = {
+            **super().to_representation(instance),
+            **instance.shared_representation,
+        }
+        return {
+            field_name: representation[field_name]
+            for field_name in self.fields
+        }
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (
             request
@@ -121,6 +253,8 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (
             request
@@ -133,9 +267,11 @@ class RecipeGetSerializer(serializers.ModelSerializer):
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
         read_only_fields = ('__all__',)
 
 
@@ -144,11 +280,6 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ('recipe', 'user')
 
-    def validate(self, data):
-        if data['user'].favorites.filter(recipe=data['recipe']).exists():
-            raise serializers.ValidationError('Рецепт уже в избранном')
-        return data
-
     def to_representation(self, instance):
         return ShortRecipeSerializer(
             instance.recipe,
@@ -161,11 +292,6 @@ class ShoppingListSerializer(serializers.ModelSerializer):
         fields = ('recipe', 'user')
         model = ShoppingList
 
-    def validate(self, data):
-        if data['user'].shopping_list.filter(recipe=data['recipe']).exists():
-            raise serializers.ValidationError('Рецепт уже корзине')
-        return data
-
     def to_representation(self, instance):
         return ShortRecipeSerializer(
             instance.recipe,
@@ -173,9 +299,16 @@ class ShoppingListSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT,
+    )
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
@@ -187,6 +320,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'last_name',
             'recipes',
             'recipes_count',
+            'followers_count',
         )
         read_only_fields = (
             'id',
@@ -194,6 +328,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'username',
             'first_name',
             'last_name',
+            'recipes_count',
+            'followers_count',
         )
 
     def validate(self, data):
@@ -212,25 +348,22 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return data
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipies.all()
-        if limit:
-            recipes = recipes[: int(limit)]
+        if hasattr(obj, 'page_recipes'):
+            recipes = obj.page_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipies.all()
+            if limit:
+                recipes = recipes[: int(limit)]
         serializer = ShortRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipies.count()
-
 
 class RecipePostSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = IngredientAmountPostSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField()
     cooking_time = serializers.IntegerField()
 
@@ -250,29 +383,41 @@ class RecipePostSerializer(serializers.ModelSerializer):
     def validate_tags(self, tags):
         if not tags:
             raise serializers.ValidationError('Не выбраны тэги')
-        for tag in tags:
-            if not Tag.objects.filter(id=tag.id).exists():
-                raise serializers.ValidationError(
-                    'Указанного тэга не существует',
-                )
-        return tags
+        tag_ids = list(dict.fromkeys(tags))
+        existing = Tag.objects.in_bulk(tag_ids)
+        errors = {
+            index: ['Указанного тэга не существует']
+            for index, tag_id in enumerate(tags)
+            if tag_id not in existing
+        }
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [existing[tag_id] for tag_id in tag_ids]
 
     def validate_ingredients(self, ingredients):
         if not ingredients:
             raise serializers.ValidationError('Не выбраны ингредиенты')
 
-        ingredients_list = []
-        for ingredient in ingredients:
-            if ingredient['id'] in ingredients_list:
-                raise serializers.ValidationError(
-                    'Вы уже использовали данный ингредиент',
-                )
-            ingredients_list.append(ingredient['id'])
-
-            if int(ingredient['amount']) <= 0:
-                raise serializers.ValidationError(
-                    'Укажите верное количество ингредиента',
-                )
+        existing = set(
+            Ingredient.objects.filter(
+                id__in={ingredient['id'] for ingredient in ingredients},
+            ).values_list('id', flat=True),
+        )
+        used = set()
+        errors = {}
+        for index, ingredient in enumerate(ingredients):
+            error = {}
+            if ingredient['id'] not in existing:
+                error['id'] = ['Указанного ингредиента не существует']
+            elif ingredient['id'] in used:
+                error['id'] = ['Вы уже использовали данный ингредиент']
+            if ingredient['amount'] <= 0:
+                error['amount'] = ['Укажите верное количество ингредиента']
+            used.add(ingredient['id'])
+            if error:
+                errors[index] = error
+        if errors:
+            raise serializers.ValidationError(errors)
         return ingredients
 
     def validate_cooking_time(self, cooking_time):
@@ -283,6 +428,7 @@ class RecipePostSerializer(serializers.ModelSerializer):
         return cooking_time
 
     def to_representation(self, instance):
+        instance.refresh_from_db()
         return RecipeGetSerializer(
             instance,
             context={'request': self.context.get('request')},
@@ -301,6 +447,7 @@ class RecipePostSerializer(serializers.ModelSerializer):
             )
         IngredientAmount.objects.bulk_create(ingredient_list)
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
@@ -308,13 +455,67 @@ class RecipePostSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        refresh_search_ingredients([recipe.id])
+        record_recipe_changes([recipe.id])
         return recipe
 
+    @classmethod
+    def update_ingredients(cls, recipe, ingredients):
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            amount.ingredient_id: amount
+            for amount in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        changed = []
+        for ingredient_id, amount in current.items():
+            if amounts.get(ingredient_id, amount.amount) != amount.amount:
+                amount.amount = amounts[ingredient_id]
+                changed.append(amount)
+        added = [
+            ingredient
+            for ingredient in ingredients
+            if ingredient['id'] not in current
+        ]
+        removed = current.keys() - amounts.keys()
+        if removed:
+            # A single DELETE without a post_delete signal for every row,
+            # the recipe is refreshed once below as for the bulk writes.
+            removed_amounts = IngredientAmount.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed,
+            )
+            removed_amounts._raw_delete(removed_amounts.db)
+        IngredientAmount.objects.bulk_update(changed, ('amount',))
+        cls.create_ingredients(recipe, added)
+        if added or removed:
+            refresh_search_ingredients([recipe.id])
+            record_recipe_changes([recipe.id])
+        if changed or added or removed:
+            invalidate_recipes([recipe.id])
+            bump_recipe_carts(recipe.id)
+            bump_table_versions(
+                IngredientAmount._meta.db_table,
+                Recipe._meta.db_table,
+            )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        instance.tags.clear()
-        instance.tags.set(tags)
-        self.create_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        changed = [
+            field
+            for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
@@ -0,0 +1,178 @@
+import csv
+from functools import partial
+from io import BytesIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+from recipies.models import ShoppingList
+
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+def cart_version_key(user_id):
+    return f'shopping_cart:{user_id}:version'
+
+
+def get_cart_version(user_id):
+    return cache.get_or_set(
+        cart_version_key(user_id),
+        lambda: uuid4().hex,
+        None,
+    )
+
+
+def delete_cart_versions(user_ids):
+    cache.delete_many([cart_version_key(user_id) for user_id in user_ids])
+
+
+def bump_cart_versions(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    delete_cart_versions(user_ids)
+    # A download may cache the old cart again before the transaction commits.
+    transaction.on_commit(partial(delete_cart_versions, user_ids))
+
+
+def bump_cart_version(user_id):
+    bump_cart_versions([user_id])
+
+
+def bump_recipe_carts(recipe_id):
+    bump_cart_versions(
+        ShoppingList.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id',
+            flat=True,
+        ),
+    )
+
+
+def bump_ingredient_carts(ingredient_id):
+    bump_cart_versions(
+        ShoppingList.objects.filter(
+            recipe__ingredient_amount__ingredient_id=ingredient_id,
+        )
+        .values_list('user_id', flat=True)
+        .distinct(),
+    )
+
+
+def get_cart_cache_key(user_id, file_format):
+    return (
+        f'shopping_cart:{user_id}:{get_cart_version(user_id)}:{file_format}'
+    )
+
+
+def get_title(user):
+    return f'Список покупок для пользователя: {user.username}'
+
+
+def get_footer():
+    return f'Foodgram ({timezone.localdate():%Y})'
+
+
+def get_line(ingredient):
+    return (
+        f'- {ingredient["ingredient__name"]} '
+        f'({ingredient["ingredient__measurement_unit"]})'
+        f' - {ingredient["quantity"]}'
+    )
+
+
+def render_txt(user, ingredients):
+    yield f'{get_title(user)}\n\n'.encode()
+    for ingredient in ingredients:
+        yield f'{get_line(ingredient)}\n'.encode()
+    yield f'\n{get_footer()}'.encode()
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(user, ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ('Ингредиент', 'Единицы измерения', 'Количество'),
+    ).encode()
+    for ingredient in ingredients:
+        yield writer.writerow(
+            (
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['quantity'],
+            ),
+        ).encode()
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        try:
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT),
+            )
+        except TTFError as error:
+            # The built-in fonts have no Cyrillic glyphs.
+            raise ImproperlyConfigured(
+                'SHOPPING_LIST_PDF_FONT must point to a TrueType font with '
+                f'Cyrillic glyphs: {error}',
+            ) from error
+    return PDF_FONT_NAME
+
+
+def render_pdf(user, ingredients):
+    # Built eagerly so a broken font fails the request before streaming.
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    font = get_pdf_font()
+    _, height = A4
+    position = height - PDF_MARGIN
+    pdf.setFont(font, PDF_FONT_SIZE)
+    lines = (
+        get_title(user),
+        '',
+        *(get_line(ingredient) for ingredient in ingredients),
+        '',
+        get_footer(),
+    )
+    for line in lines:
+        if position < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            position = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, position, line)
+        position -= PDF_LINE_HEIGHT
+    pdf.save()
+    return (buffer.getvalue(),)
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+
+
+def cache_stream(chunks, cache_key):
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set(
+        cache_key,
+        b''.join(content),
+        settings.SHOPPING_CART_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,167 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.catalog import bump_catalog_version
+from api.counts import bump_table_versions
+from api.pantry import record_recipe_changes
+from api.shopping_cart import (bump_cart_version, bump_ingredient_carts,
+                               bump_recipe_carts)
+from recipies.cache import invalidate_recipes
+from recipies.counters import COUNTERS, update_counter
+from recipies.feed import (add_author_to_feed, add_recipe_to_feeds,
+                           remove_author_from_feed)
+from recipies.images import schedule_variants, variants_ready
+from recipies.models import (Favorite, FeedItem, Ingredient,
+                             IngredientAmount, Recipe, ShoppingList, Tag)
+from recipies.search import refresh_search_ingredients
+from recipies.tags import refresh_tag_ids
+from users.models import Subscription, User
+
+
+@receiver((post_save, post_delete), sender=ShoppingList)
+def shopping_list_changed(sender, instance, **kwargs):
+    bump_cart_version(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_changed(sender, instance, origin=None, **kwargs):
+    bump_recipe_carts(instance.recipe_id)
+    if not isinstance(origin, Recipe):
+        refresh_search_ingredients([instance.recipe_id])
+        record_recipe_changes([instance.recipe_id])
+        invalidate_recipes([instance.recipe_id])
+        bump_table_versions(Recipe._meta.db_table)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        bump_recipe_carts(instance.id)
+        refresh_search_ingredients([instance.id])
+        record_recipe_changes([instance.id])
+        invalidate_recipes([instance.id])
+        bump_table_versions(Recipe._meta.db_table)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        recipe_ids = [instance.id]
+    elif action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipies.values_list('id', flat=True),
+        )
+        return
+    elif action == 'post_clear':
+        recipe_ids = instance._cleared_recipe_ids
+    else:
+        recipe_ids = pk_set
+    if action.startswith('post_'):
+        refresh_tag_ids(recipe_ids)
+        invalidate_recipes(recipe_ids)
+        bump_table_versions(Recipe._meta.db_table)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    # The through rows are gone without m2m_changed, tag_ids still knows
+    # the affected recipes.
+    refresh_tag_ids(
+        Recipe.objects.filter(tag_ids__overlap=[instance.id]).values_list(
+            'id',
+            flat=True,
+        ),
+    )
+    bump_table_versions(Recipe._meta.db_table)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Cached shopping lists embed ingredient names and units.
+        bump_ingredient_carts(instance.id)
+        refresh_search_ingredients(
+            IngredientAmount.objects.filter(ingredient=instance).values_list(
+                'recipe_id',
+                flat=True,
+            ),
+        )
+        bump_table_versions(Recipe._meta.db_table)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_feeds(instance)
+        bump_table_versions(FeedItem._meta.db_table)
+    if instance.image and not variants_ready(instance):
+        transaction.on_commit(partial(schedule_variants, instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    record_recipe_changes([instance.id])
+    # The recipe's feed items are deleted along with it.
+    bump_table_versions(FeedItem._meta.db_table)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.id])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        add_author_to_feed(instance.user_id, instance.author_id)
+        bump_table_versions(FeedItem._meta.db_table)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+    bump_table_versions(FeedItem._meta.db_table)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Subscription)
+def counted_row_changed(sender, instance, signal, created=True, **kwargs):
+    if not created:
+        return
+    delta = 1 if signal is post_save else -1
+    for model, field, related_model, related_field in COUNTERS:
+        if related_model is sender:
+            update_counter(
+                model,
+                getattr(instance, f'{related_field}_id'),
+                field,
+                delta,
+            )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+# Senders are listed explicitly, a model with delete listeners loses
+# Django's fast delete. FeedItem is bumped where the feeds are written.
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Subscription)
+@receiver((post_save, post_delete), sender=User)
+def table_changed(sender, **kwargs):
+    bump_table_versions(sender._meta.db_table)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def m2m_table_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_table_versions(sender._meta.db_table)
@@ -0,0 +1,302 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.counts import COUNT_STRATEGIES
+from api.management.commands.check_query_budget import (
+    BUDGET_COUNT_STRATEGIES, PAGE_SIZES, QUERY_BUDGET, Command)
+from api.pantry import pantry_index
+from recipies.models import Ingredient, IngredientAmount, Recipe
+from users.models import User
+
+WARM_QUERY_BUDGET = {
+    'recipes-list': 2,
+    'recipes-detail': 2,
+}
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def create_recipe(author, name, ingredients=()):
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        text='text',
+        image='recipies/images/budget.png',
+        cooking_time=10,
+    )
+    for ingredient in ingredients:
+        IngredientAmount.objects.create(
+            recipe=recipe,
+            ingredient=ingredient,
+            amount=1,
+        )
+    return recipe
+
+
+@override_settings(DATABASE_REPLICAS=[])
+@patch.dict(COUNT_STRATEGIES, BUDGET_COUNT_STRATEGIES)
+class QueryBudgetTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        clear_caches()
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def seed(self, size):
+        user, recipe, author = Command.seed(size)
+        self.client.force_authenticate(user)
+        return recipe, author
+
+    def test_read_routes_within_budget(self):
+        for size in PAGE_SIZES:
+            with transaction.atomic():
+                clear_caches()
+                recipe, author = self.seed(size)
+                for route, url in Command.get_routes(size, recipe, author):
+                    with self.subTest(route=route, size=size):
+                        with self.assertNumQueries(QUERY_BUDGET[route]):
+                            response = self.get(url)
+                        self.assertEqual(response.status_code, 200)
+                transaction.set_rollback(True)
+
+    def test_recipes_served_from_cache(self):
+        recipe, _ = self.seed(10)
+        for route, url in (
+            ('recipes-list', '/api/recipes/?limit=10'),
+            ('recipes-detail', f'/api/recipes/{recipe.id}/'),
+        ):
+            with self.subTest(route=route):
+                cold = self.get(url)
+                with self.assertNumQueries(WARM_QUERY_BUDGET[route]):
+                    warm = self.get(url)
+                self.assertEqual(warm.json(), cold.json())
+
+    def test_cached_recipe_invalidated(self):
+        recipe, _ = self.seed(1)
+        url = f'/api/recipes/{recipe.id}/'
+        self.get(url)
+        amount = IngredientAmount.objects.filter(recipe=recipe).first()
+        amount.amount += 10
+        amount.save()
+        ingredients = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in self.get(url).json()['ingredients']
+        }
+        self.assertEqual(ingredients[amount.ingredient_id], amount.amount)
+
+
+@patch.object(pantry_index, 'snapshot', None)
+class PantryIndexTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        clear_caches()
+        self.author = User.objects.create_user(
+            username='pantry',
+            email='pantry@example.com',
+            password='pantry-password',
+        )
+        self.a, self.b, self.c, self.d, self.e = (
+            Ingredient.objects.create(
+                name=f'ingredient {name}',
+                measurement_unit='г',
+            )
+            for name in 'abcde'
+        )
+        self.ab = create_recipe(self.author, 'ab', (self.a, self.b))
+        self.abc = create_recipe(
+            self.author,
+            'abc',
+            (self.a, self.b, self.c),
+        )
+        self.only_c = create_recipe(self.author, 'c', (self.c,))
+        self.de = create_recipe(self.author, 'de', (self.d, self.e))
+
+    def get_ids(self, **params):
+        response = self.client.get(
+            '/api/recipes/',
+            {
+                'limit': 100,
+                **{
+                    name: ','.join(str(item.id) for item in value)
+                    if isinstance(value, tuple)
+                    else value
+                    for name, value in params.items()
+                },
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.json()['results']}
+
+    def test_pantry_covers_every_ingredient(self):
+        self.assertEqual(
+            self.get_ids(pantry=(self.a, self.b)),
+            {self.ab.id},
+        )
+        self.assertEqual(
+            self.get_ids(pantry=(self.a, self.b, self.c, self.d)),
+            {self.ab.id, self.abc.id, self.only_c.id},
+        )
+
+    def test_pantry_with_missing_ingredients(self):
+        self.assertEqual(
+            self.get_ids(pantry=(self.a, self.b), missing=1),
+            {self.ab.id, self.abc.id, self.only_c.id},
+        )
+        self.assertEqual(
+            self.get_ids(pantry=(self.a,), missing=2),
+            {self.ab.id, self.abc.id, self.only_c.id, self.de.id},
+        )
+        self.assertEqual(self.get_ids(pantry=(self.e,), missing=0), set())
+
+    def test_include_and_exclude_ingredients(self):
+        self.assertEqual(
+            self.get_ids(ingredients=(self.a,)),
+            {self.ab.id, self.abc.id},
+        )
+        self.assertEqual(
+            self.get_ids(ingredients=(self.a, self.c)),
+            {self.abc.id},
+        )
+        self.assertEqual(
+            self.get_ids(exclude_ingredients=(self.a,)),
+            {self.only_c.id, self.de.id},
+        )
+        self.assertEqual(
+            self.get_ids(
+                ingredients=(self.a,),
+                exclude_ingredients=(self.c,),
+            ),
+            {self.ab.id},
+        )
+
+    def test_index_follows_recipe_changes(self):
+        self.assertEqual(
+            self.get_ids(pantry=(self.a, self.b)),
+            {self.ab.id},
+        )
+        IngredientAmount.objects.filter(
+            recipe=self.abc,
+            ingredient=self.c,
+        ).delete()
+        self.ab.delete()
+        only_a = create_recipe(self.author, 'a', (self.a,))
+        self.assertEqual(
+            self.get_ids(pantry=(self.a, self.b)),
+            {self.abc.id, only_a.id},
+        )
+        self.assertEqual(
+            self.get_ids(exclude_ingredients=(self.c,)),
+            {self.abc.id, self.de.id, only_a.id},
+        )
+        synced = pantry_index.snapshot
+        built = pantry_index.build()
+        self.assertEqual(
+            {
+                ingredient_id: list(posting)
+                for ingredient_id, posting in synced.postings.items()
+                if posting
+            },
+            {
+                ingredient_id: list(posting)
+                for ingredient_id, posting in built.postings.items()
+            },
+        )
+        self.assertEqual(synced.sizes, built.sizes)
+
+
+class RecipeCursorTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        clear_caches()
+        author = User.objects.create_user(
+            username='cursor',
+            email='cursor@example.com',
+            password='cursor-password',
+        )
+        recipes = [
+            create_recipe(author, f'recipe {i}') for i in range(7)
+        ]
+        now = timezone.now()
+        # Three recipes share a date, so pages split inside the tie.
+        for recipe, pub_date in zip(
+            recipes,
+            (
+                now - timedelta(hours=2),
+                now,
+                now,
+                now,
+                now - timedelta(hours=1),
+                now - timedelta(hours=3),
+                now - timedelta(hours=1),
+            ),
+        ):
+            recipe.pub_date = pub_date
+        Recipe.objects.bulk_update(recipes, ['pub_date'])
+        self.ordered = [
+            recipe.id
+            for recipe in sorted(
+                recipes,
+                key=lambda recipe: (recipe.pub_date, recipe.id),
+                reverse=True,
+            )
+        ]
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        return [recipe['id'] for recipe in page['results']], page
+
+    def test_cursor_round_trip(self):
+        pages = []
+        url = '/api/recipes/?limit=2&cursor='
+        while url:
+            ids, page = self.get_page(url)
+            pages.append(ids)
+            url = page['next']
+        self.assertEqual(
+            pages,
+            [self.ordered[i:i + 2] for i in range(0, len(self.ordered), 2)],
+        )
+        self.assertIsNone(page['next'])
+        back = []
+        url = page['previous']
+        while url:
+            ids, page = self.get_page(url)
+            back.append(ids)
+            url = page['previous']
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_ties_on_pub_date_are_not_skipped(self):
+        for limit in range(1, len(self.ordered) + 1):
+            with self.subTest(limit=limit):
+                seen = []
+                url = f'/api/recipes/?limit={limit}&cursor='
+                while url:
+                    ids, page = self.get_page(url)
+                    seen.extend(ids)
+                    url = page['next']
+                self.assertEqual(seen, self.ordered)
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'WzFd', 'bm90IGpzb24='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'/api/recipes/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'], 'Неверный курсор')
@@ -1,45 +1,189 @@
-from django.shortcuts import HttpResponse, get_object_or_404
-from django.utils import timezone
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from recipies.models import Recipe
+from api.counts import bump_table_versions
+from api.shopping_cart import (SHOPPING_CART_FORMATS, bump_cart_version,
+                               cache_stream, get_cart_cache_key)
+from recipies.counters import update_counters
+from recipies.models import Favorite, Recipe, ShoppingList
+from users.models import Subscription
+
+LIST_MESSAGES = {
+    Favorite: ('Рецепт уже в избранном', 'Рецепта нет в избранном'),
+    ShoppingList: ('Рецепт уже в корзине', 'Рецепта нет в корзине'),
+}
+
+
+def subscribed_author_ids(user):
+    return Subscription.objects.filter(user=user).values_list(
+        'author_id',
+        flat=True,
+    )
+
+
+def get_subscribed_ids(request):
+    if not hasattr(request, '_subscribed_ids'):
+        request._subscribed_ids = set(subscribed_author_ids(request.user))
+    return request._subscribed_ids
+
+
+async def aget_subscribed_ids(request):
+    if not hasattr(request, '_subscribed_ids'):
+        request._subscribed_ids = {
+            author_id
+            async for author_id in subscribed_author_ids(request.user)
+        }
+    return request._subscribed_ids
+
+
+def add_to_list(model, user_id, recipe_ids):
+    if not recipe_ids:
+        return []
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(model._meta.db_table)} '
+            '(user_id, recipe_id) '
+            f'SELECT %s, id FROM {quote_name(Recipe._meta.db_table)} '
+            f'WHERE id IN ({placeholders}) '
+            'ON CONFLICT DO NOTHING RETURNING recipe_id',
+            [user_id, *recipe_ids],
+        )
+        return [recipe_id for recipe_id, in cursor.fetchall()]
+
+
+def remove_from_list(model, user_id, recipe_ids=None):
+    quote_name = connection.ops.quote_name
+    condition = ''
+    params = [user_id]
+    if recipe_ids is not None:
+        if not recipe_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        condition = f' AND recipe_id IN ({placeholders})'
+        params.extend(recipe_ids)
+    with connection.cursor() as cursor:
+        # Rows a concurrent request deleted first are not returned.
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} '
+            f'WHERE user_id = %s{condition} RETURNING recipe_id',
+            params,
+        )
+        return [recipe_id for recipe_id, in cursor.fetchall()]
+
+
+def rows_changed(model, user_id, recipe_ids, delta):
+    # Raw statements send no post_save or post_delete.
+    if not recipe_ids:
+        return
+    update_counters(model, recipe_ids, delta)
+    if model is ShoppingList:
+        bump_cart_version(user_id)
+    bump_table_versions(model._meta.db_table)
+
+
+def rows_added(model, user_id, recipe_ids):
+    rows_changed(model, user_id, recipe_ids, 1)
+
+
+def rows_removed(model, user_id, recipe_ids):
+    rows_changed(model, user_id, recipe_ids, -1)
 
 
 def post_delete(add_serializer, model, request, recipe_id):
+    try:
+        recipe_id = int(recipe_id)
+    except ValueError:
+        raise Http404
     user = request.user
-    data = {'user': user.id, 'recipe': recipe_id}
-    serializer = add_serializer(data=data, context={'request': request})
+    exists_message, missing_message = LIST_MESSAGES[model]
+    with transaction.atomic():
+        if request.method == 'POST':
+            changed = add_to_list(model, user.id, [recipe_id])
+            rows_added(model, user.id, changed)
+            message = exists_message
+        else:
+            changed = remove_from_list(model, user.id, [recipe_id])
+            rows_removed(model, user.id, changed)
+            message = missing_message
+    if not changed:
+        get_object_or_404(Recipe.objects.only('id'), id=recipe_id)
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]})
     if request.method == 'POST':
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer = add_serializer(
+            model(user=user, recipe_id=recipe_id),
+            context={'request': request},
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    get_object_or_404(
-        model,
-        user=user,
-        recipe=get_object_or_404(Recipe, id=recipe_id),
-    ).delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def ingredients_download(self, request, ingredients):
-    filename = 'shopping_list.txt'
-    shopping_list = (
-        f'Список покупок для пользователя: {self.request.user.username}\n\n'
+def bulk_post_delete(ids_serializer, model, request):
+    serializer = ids_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user = request.user
+    recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+    existing = set(
+        Recipe.objects.filter(id__in=recipe_ids).values_list('id', flat=True),
     )
-    shopping_list += '\n'.join(
-        [
-            f'- {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["quantity"]}'
-            for ingredient in ingredients
-        ],
+    with transaction.atomic():
+        if request.method == 'POST':
+            changed = add_to_list(model, user.id, list(existing))
+            rows_added(model, user.id, changed)
+            statuses = {True: 'added', False: 'exists'}
+        else:
+            changed = remove_from_list(model, user.id, list(existing))
+            rows_removed(model, user.id, changed)
+            statuses = {True: 'removed', False: 'missing'}
+    changed = set(changed)
+    return Response(
+        {
+            'results': [
+                {
+                    'id': recipe_id,
+                    'status': (
+                        statuses[recipe_id in changed]
+                        if recipe_id in existing
+                        else 'not_found'
+                    ),
+                }
+                for recipe_id in recipe_ids
+            ],
+        },
     )
-    shopping_list += f'\n\nFoodgram ({timezone.localdate():%Y})'
 
-    response = HttpResponse(
-        shopping_list,
-        content_type='text.txt; charset=utf-8',
+
+def clear_shopping_cart(request):
+    with transaction.atomic():
+        rows_removed(
+            ShoppingList,
+            request.user.id,
+            remove_from_list(ShoppingList, request.user.id),
+        )
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def ingredients_download(request, ingredients, file_format):
+    render, content_type = SHOPPING_CART_FORMATS[file_format]
+    cache_key = get_cart_cache_key(request.user.id, file_format)
+    content = cache.get(cache_key)
+    if content is None:
+        content = cache_stream(
+            render(request.user, ingredients.iterator()),
+            cache_key,
+        )
+    else:
+        content = (content,)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename=shopping_list.{file_format}'
     )
-    response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
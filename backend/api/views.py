@@ -1,22 +1,88 @@
+from collections import defaultdict
+
+from django.db import transaction
 from django.db.models import Sum
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from api.catalog import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                         catalog_etag, catalog_last_modified,
+                         get_catalog_snapshot, ingredient_autocomplete)
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import CustomPagination
+from api.pagination import (CustomPagination, FeedPagination,
+                            RecipePagination)
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
 from api.serializers import (FavoriteSerializer, IngredientSerializer,
-                             RecipeGetSerializer, RecipePostSerializer,
-                             ShoppingListSerializer, SubscriptionSerializer,
-                             TagSerializer, UserSerializer)
-from api.utils import ingredients_download, post_delete
+                             RecipeGetSerializer, RecipeIdsSerializer,
+                             RecipePostSerializer, ShoppingListSerializer,
+                             SubscriptionSerializer, TagSerializer,
+                             UserSerializer)
+from api.shopping_cart import SHOPPING_CART_FORMATS
+from api.utils import (bulk_post_delete, clear_shopping_cart,
+                       ingredients_download, post_delete)
 from users.models import Subscription, User
-from recipies.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                             ShoppingList, Tag)
+from recipies.models import (Favorite, FeedItem, Ingredient,
+                             IngredientAmount, Recipe, ShoppingList, Tag)
+
+
+class CatalogConditionalMixin:
+    @method_decorator(
+        condition(
+            etag_func=catalog_etag,
+            last_modified_func=catalog_last_modified,
+        ),
+    )
+    def list(self, request, *args, **kwargs):
+        if self.serves_snapshot(request):
+            return self.get_snapshot_response(request)
+        return super().list(request, *args, **kwargs)
+
+    def serves_snapshot(self, request):
+        return (
+            not request.query_params
+            and request.accepted_renderer.format == 'json'
+            and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+
+    def get_snapshot_response(self, request):
+        response = HttpResponse(
+            get_catalog_snapshot(
+                self.basename,
+                lambda: request.accepted_renderer.render(
+                    self.get_serializer(self.get_queryset(), many=True).data,
+                ),
+            ),
+            content_type=request.accepted_renderer.media_type,
+        )
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+    @method_decorator(
+        condition(
+            etag_func=catalog_etag,
+            last_modified_func=catalog_last_modified,
+        ),
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs,
+        )
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
 
 
 class CreateListDestroyGenericMixins(
@@ -30,22 +96,45 @@ class CreateListDestroyGenericMixins(
     pagination_class = None
 
 
-class TagViewSet(CreateListDestroyGenericMixins):
+class TagViewSet(CatalogConditionalMixin, CreateListDestroyGenericMixins):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(CreateListDestroyGenericMixins):
+class IngredientViewSet(
+    CatalogConditionalMixin,
+    CreateListDestroyGenericMixins,
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = IngredientFilter
     filter_backends = (DjangoFilterBackend,)
 
+    @action(detail=False, methods=('get',))
+    def autocomplete(self, request):
+        try:
+            limit = min(
+                int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT)),
+                AUTOCOMPLETE_MAX_LIMIT,
+            )
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        return Response(
+            self.get_serializer(
+                ingredient_autocomplete.search(
+                    request.query_params.get('name', ''),
+                    max(limit, 1),
+                ),
+                many=True,
+            ).data,
+        )
+
 
 class UserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = CustomPagination
+    count_strategy = 'estimate'
 
     @action(
         methods=('get',),
@@ -53,13 +142,33 @@ class UserViewSet(UserViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def subscriptions(self, request):
+        authors = self.paginate_queryset(self.get_subscribed_authors())
+        return self.get_subscriptions_response(
+            authors,
+            self.get_page_recipes(authors),
+        )
+
+    def get_subscribed_authors(self):
+        return User.objects.filter(following__user=self.request.user)
+
+    def get_page_recipes(self, authors):
+        limit = self.request.query_params.get('recipes_limit')
+        return Recipe.objects.top_per_author(
+            authors,
+            int(limit) if limit else None,
+        )
+
+    def get_subscriptions_response(self, authors, page_recipes):
+        recipes = defaultdict(list)
+        for recipe in page_recipes:
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.page_recipes = recipes[author.id]
         return self.get_paginated_response(
             SubscriptionSerializer(
-                self.paginate_queryset(
-                    User.objects.filter(following__user=request.user),
-                ),
+                authors,
                 many=True,
-                context={'request': request},
+                context={'request': self.request},
             ).data,
         )
 
@@ -79,26 +188,60 @@ class UserViewSet(UserViewSet):
                 context={'request': request},
             )
             serializer.is_valid(raise_exception=True)
-            Subscription.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Subscription.objects.create(user=user, author=author)
+            author.refresh_from_db(fields=('followers_count',))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        get_object_or_404(Subscription, user=user, author=author).delete()
+        with transaction.atomic():
+            get_object_or_404(Subscription, user=user, author=author).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+    # Tags and ingredients are prefetched by RecipeGetSerializer only for
+    # recipes missing from the representation cache.
+    queryset = Recipe.objects.select_related('author')
     serializer_class = RecipeGetSerializer
     permission_classes = (IsAuthorOrReadOnly,)
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
+    count_strategy = 'estimate'
     filterset_class = RecipeFilter
     filter_backends = (DjangoFilterBackend,)
 
+    def get_queryset(self):
+        return super().get_queryset().annotate_user_flags(self.request.user)
+
     def get_serializer_class(self):
         if self.request.method in ('GET',):
             return RecipeGetSerializer
         return RecipePostSerializer
 
+    @action(
+        detail=False,
+        methods=('GET',),
+        permission_classes=[permissions.IsAuthenticated],
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        feed_items = self.paginate_queryset(
+            FeedItem.objects.filter(user=request.user),
+        )
+        recipes = self.get_queryset().in_bulk(
+            [feed_item.recipe_id for feed_item in feed_items],
+        )
+        return self.get_paginated_response(
+            RecipeGetSerializer(
+                [
+                    recipes[feed_item.recipe_id]
+                    for feed_item in feed_items
+                    if feed_item.recipe_id in recipes
+                ],
+                many=True,
+                context=self.get_serializer_context(),
+            ).data,
+        )
+
     @action(
         detail=True,
         methods=('POST', 'DELETE'),
@@ -116,12 +259,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def shopping_list(self, request, pk):
         return post_delete(ShoppingListSerializer, ShoppingList, request, pk)
 
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='favorite',
+        url_name='favorite-bulk',
+    )
+    def favorite_bulk(self, request):
+        return bulk_post_delete(RecipeIdsSerializer, Favorite, request)
+
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+    )
+    def shopping_list_bulk(self, request):
+        return bulk_post_delete(RecipeIdsSerializer, ShoppingList, request)
+
+    @action(
+        detail=False,
+        methods=('DELETE',),
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='shopping_cart/clear',
+    )
+    def clear_shopping_cart(self, request):
+        return clear_shopping_cart(request)
+
     @action(
         detail=False,
         methods=('GET',),
         permission_classes=[permissions.IsAuthenticated],
     )
     def download_shopping_cart(self, request):
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
+            return Response(
+                {
+                    'file_format': (
+                        'Допустимые форматы: '
+                        f'{", ".join(SHOPPING_CART_FORMATS)}'
+                    ),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         ingredients = (
             IngredientAmount.objects.filter(
                 recipe__shopping_list__user=self.request.user,
@@ -130,4 +313,4 @@ class RecipeViewSet(viewsets.ModelViewSet):
             .order_by('ingredient__name')
             .annotate(quantity=Sum('amount'))
         )
-        return ingredients_download(self, request, ingredients)
+        return ingredients_download(request, ingredients, file_format)
@@ -0,0 +1,169 @@
+import os
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+UNMATCHED_ROUTE = 'unmatched'
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float('inf'),
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf'))
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Requests by route, method and status code.',
+    ('route', 'method', 'status'),
+)
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Time until the view returned a response.',
+    ('route', 'method'),
+)
+QUERIES = Histogram(
+    'foodgram_http_db_queries',
+    'SQL queries executed per request.',
+    ('route', 'method'),
+    buckets=QUERY_BUCKETS,
+)
+DB_TIME = Histogram(
+    'foodgram_http_db_duration_seconds',
+    'Time spent in SQL queries per request.',
+    ('route', 'method'),
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_http_response_size_bytes',
+    'Response body size, streamed bodies are measured once sent.',
+    ('route', 'method'),
+    buckets=SIZE_BUCKETS,
+)
+
+request_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # ContextVars are copied into sync_to_async threads, so queries of
+        # async views land in the same object.
+        stats.queries += 1
+        stats.db_time += perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_route(request):
+    match = request.resolver_match
+    if match is None or not match.url_name:
+        return UNMATCHED_ROUTE
+    return match.url_name
+
+
+def observe(request, response, stats, elapsed):
+    labels = (get_route(request), request.method)
+    REQUESTS.labels(*labels, str(response.status_code)).inc()
+    LATENCY.labels(*labels).observe(elapsed)
+    QUERIES.labels(*labels).observe(stats.queries)
+    DB_TIME.labels(*labels).observe(stats.db_time)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(*labels).observe(len(response.content))
+        return
+    size = RESPONSE_SIZE.labels(*labels)
+    if response.is_async:
+
+        async def measured(content):
+            sent = 0
+            try:
+                async for chunk in content:
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                size.observe(sent)
+
+    else:
+
+        def measured(content):
+            sent = 0
+            try:
+                for chunk in content:
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                size.observe(sent)
+
+    response.streaming_content = measured(response.streaming_content)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            stats = RequestStats()
+            token = request_stats.set(stats)
+            started = perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                request_stats.reset(token)
+            observe(request, response, stats, perf_counter() - started)
+            return response
+
+    else:
+
+        def middleware(request):
+            stats = RequestStats()
+            token = request_stats.set(stats)
+            started = perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                request_stats.reset(token)
+            observe(request, response, stats, perf_counter() - started)
+            return response
+
+    return middleware
+
+
+def metrics_view(request):
+    # Closed until a token is configured, route names and traffic are not
+    # meant for the public.
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        f'Bearer {settings.METRICS_TOKEN}',
+    ):
+        return HttpResponseForbidden()
+    registry = REGISTRY
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Every gunicorn worker writes its own mmap files, the endpoint
+        # merges them no matter which worker serves the scrape.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry),
+        content_type=CONTENT_TYPE_LATEST,
+    )
@@ -0,0 +1,104 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import md5
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_PATH_PREFIX = '/api/'
+# Signup and login carry no credentials to key the read-your-writes
+# marker on, so the token and its user are always read from the primary.
+PRIMARY_MODELS = ('authtoken.token',)
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def use_primary():
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        if settings.DATABASE_REPLICAS and read_from_replica.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+def get_writes_key(request):
+    # Token clients are recognised by their header, browsers by session.
+    marker = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME,
+    )
+    if not marker:
+        return None
+    return f'read_your_writes:{md5(marker.encode()).hexdigest()}'
+
+
+def replica_allowed(request, recent_write):
+    return (
+        request.method in SAFE_METHODS
+        and request.path.startswith(REPLICA_PATH_PREFIX)
+        and not recent_write
+    )
+
+
+def is_write(request, response):
+    return request.method not in SAFE_METHODS and response.status_code < 400
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            key = get_writes_key(request)
+            recent_write = key is not None and await cache.aget(key)
+            token = read_from_replica.set(
+                replica_allowed(request, recent_write),
+            )
+            try:
+                response = await get_response(request)
+            finally:
+                read_from_replica.reset(token)
+            if key is not None and is_write(request, response):
+                await cache.aset(key, True, settings.READ_YOUR_WRITES_WINDOW)
+            return response
+
+    else:
+
+        def middleware(request):
+            key = get_writes_key(request)
+            recent_write = key is not None and cache.get(key)
+            token = read_from_replica.set(
+                replica_allowed(request, recent_write),
+            )
+            try:
+                response = get_response(request)
+            finally:
+                read_from_replica.reset(token)
+            if key is not None and is_write(request, response):
+                cache.set(key, True, settings.READ_YOUR_WRITES_WINDOW)
+            return response
+
+    return middleware
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from urllib.parse import urlsplit
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.metrics_middleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -32,6 +34,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    'foodgram.replicas.replica_middleware',
 ]
 
 ROOT_URLCONF = "foodgram.urls"
@@ -65,6 +68,52 @@ DATABASES = {
     },
 }
 
+# DB_REPLICAS=replica1.local,replica2.local:5433/foodgram
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').replace(' ', '').split(',')),
+    start=1,
+):
+    replica = urlsplit(f'//{replica}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica.hostname,
+        'PORT': replica.port or DATABASES['default']['PORT'],
+        'NAME': replica.path.lstrip('/') or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+
+READ_YOUR_WRITES_WINDOW = int(os.getenv('READ_YOUR_WRITES_WINDOW', 10))
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+RECIPE_CACHE_BACKEND = os.getenv('RECIPE_CACHE_BACKEND', LOCMEM_CACHE)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', LOCMEM_CACHE),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'recipes': {
+        'BACKEND': RECIPE_CACHE_BACKEND,
+        'LOCATION': os.getenv('RECIPE_CACHE_LOCATION', 'recipes'),
+        # Invalidations by other processes, management commands included,
+        # never reach a process-local cache.
+        'TIMEOUT': int(
+            os.getenv(
+                'RECIPE_CACHE_TIMEOUT',
+                60 if RECIPE_CACHE_BACKEND == LOCMEM_CACHE else 60 * 60,
+            ),
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.'
@@ -130,3 +179,47 @@ DJOSER = {
         'user_create': 'api.serializers.UserCreateSerializer',
     },
 }
+
+SHOPPING_CART_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_CART_CACHE_TIMEOUT', 60 * 60 * 24),
+)
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 60),
+)
+
+PAGINATION_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATE_THRESHOLD', 100_000),
+)
+
+CATALOG_SNAPSHOT_TIMEOUT = int(
+    os.getenv('CATALOG_SNAPSHOT_TIMEOUT', 60 * 60 * 24),
+)
+
+FEED_FOLLOW_RECIPES = int(os.getenv('FEED_FOLLOW_RECIPES', 100))
+
+FEED_BATCH_SIZE = 1000
+
+SEARCH_BATCH_SIZE = 1000
+
+RECIPE_IMAGE_VARIANTS = {
+    'small': (320, 320),
+    'medium': (800, 800),
+}
+
+RECIPE_IMAGE_VARIANTS_ASYNC = (
+    os.getenv('RECIPE_IMAGE_VARIANTS_ASYNC', 'true').lower() == 'true'
+)
+
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
+ASYNC_READ_VIEWS = (
+    os.getenv('ASYNC_READ_VIEWS', 'false').lower() == 'true'
+)
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
@@ -0,0 +1,45 @@
+import os
+import shutil
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if os.getenv('SERVER_PROFILE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    os.environ.setdefault('ASYNC_READ_VIEWS', 'true')
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+# Workers write metrics to mmap files here, /api/metrics merges them.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/foodgram-metrics')
+
+
+def on_starting(server):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+
+    # Versions, invalidations and the read-your-writes marker live in the
+    # caches, a per-process cache only reaches the worker that wrote.
+    local = [
+        alias
+        for alias, options in settings.CACHES.items()
+        if options['BACKEND'] == LOCMEM_CACHE
+    ]
+    if server.cfg.workers > 1 and local:
+        raise RuntimeError(
+            f'{server.cfg.workers} workers need a shared cache, '
+            f'{", ".join(local)} use LocMemCache. Set CACHE_BACKEND and '
+            'RECIPE_CACHE_BACKEND or run a single worker.',
+        )
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
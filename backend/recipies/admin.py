@@ -1,10 +1,52 @@
 from django.contrib import admin
+from django.db.models import Count
 
 from recipies.models import Favorite, Ingredient, Recipe, ShoppingList, Tag
 
 
 class BaseAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
+    show_full_result_count = False
+
+
+class InputFilter(admin.SimpleListFilter):
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'query_parts': (
+                (name, value)
+                for name, value in changelist.get_filters_params().items()
+                if name != self.parameter_name
+            ),
+        }
+
+
+class UserFilter(InputFilter):
+    title = 'пользователю'
+    parameter_name = 'user'
+    lookup = 'user__username__istartswith'
+
+
+class AuthorFilter(InputFilter):
+    title = 'автору'
+    parameter_name = 'author'
+    lookup = 'author__username__istartswith'
+
+
+class RecipeFilter(InputFilter):
+    title = 'рецепту'
+    parameter_name = 'recipe'
+    lookup = 'recipe__name__istartswith'
 
 
 @admin.register(Tag)
@@ -14,15 +56,37 @@ class TagAdmin(BaseAdmin):
         'name',
         'color',
         'slug',
+        'recipes_count',
     )
-    search_fields = ('name',)
+    search_fields = ('^name',)
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(recipes_count=Count('recipies'))
+        )
+
+    @admin.display(description='Рецептов', ordering='recipes_count')
+    def recipes_count(self, obj):
+        return obj.recipes_count
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(BaseAdmin):
-    list_display = ('id', 'name', 'measurement_unit')
-    search_fields = ('name',)
-    list_filter = ('name',)
+    list_display = ('id', 'name', 'measurement_unit', 'recipes_count')
+    search_fields = ('^name',)
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(recipes_count=Count('ingredient_amount'))
+        )
+
+    @admin.display(description='Рецептов', ordering='recipes_count')
+    def recipes_count(self, obj):
+        return obj.recipes_count
 
 
 @admin.register(Recipe)
@@ -33,23 +97,28 @@ class RecipeAdmin(BaseAdmin):
         'name',
         'author',
         'cooking_time',
-        'in_favorite',
+        'favorites_count',
+        'shopping_cart_count',
     )
-    list_filter = ('name', 'author', 'tags')
-    search_fields = ('name', 'author', 'tags')
-
-    @admin.display(description='В избранном')
-    def in_favorite(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+    list_filter = (AuthorFilter, 'tags')
+    list_select_related = ('author',)
+    search_fields = ('^name',)
+    autocomplete_fields = ('author',)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(BaseAdmin):
     list_display = ('id', 'user', 'recipe')
-    list_filter = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
+    list_filter = (UserFilter, RecipeFilter)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingList)
-class ShoplistAdmin(admin.ModelAdmin):
+class ShoplistAdmin(BaseAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_filter = (UserFilter, RecipeFilter)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
@@ -0,0 +1,67 @@
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+RECIPE_CACHE_ALIAS = 'recipes'
+GENERATION_KEY = 'recipe:generation'
+
+
+def get_recipe_cache():
+    return caches[RECIPE_CACHE_ALIAS]
+
+
+def get_generation():
+    return get_recipe_cache().get_or_set(
+        GENERATION_KEY,
+        lambda: uuid4().hex,
+        None,
+    )
+
+
+def bump_generation():
+    get_recipe_cache().delete(GENERATION_KEY)
+
+
+def get_recipe_key(generation, recipe_id):
+    return f'recipe:{generation}:{recipe_id}'
+
+
+def get_cached_recipes(recipe_ids):
+    generation = get_generation()
+    cached = get_recipe_cache().get_many(
+        [get_recipe_key(generation, recipe_id) for recipe_id in recipe_ids],
+    )
+    return {
+        recipe_id: cached[get_recipe_key(generation, recipe_id)]
+        for recipe_id in recipe_ids
+        if get_recipe_key(generation, recipe_id) in cached
+    }
+
+
+def cache_recipes(representations):
+    if representations:
+        generation = get_generation()
+        get_recipe_cache().set_many(
+            {
+                get_recipe_key(generation, recipe_id): representation
+                for recipe_id, representation in representations.items()
+            },
+        )
+
+
+def delete_recipes(recipe_ids):
+    generation = get_generation()
+    get_recipe_cache().delete_many(
+        [get_recipe_key(generation, recipe_id) for recipe_id in recipe_ids],
+    )
+
+
+def invalidate_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    delete_recipes(recipe_ids)
+    # A reader may cache the old rows again before the transaction commits.
+    transaction.on_commit(partial(delete_recipes, recipe_ids))
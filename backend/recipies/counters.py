@@ -0,0 +1,60 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipies.models import Favorite, Recipe, ShoppingList
+from users.models import Subscription, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+def get_counter_value(field, delta):
+    if delta > 0:
+        return F(field) + delta
+    return Greatest(F(field) + delta, Value(0))
+
+
+def update_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(
+        **{field: get_counter_value(field, delta)},
+    )
+
+
+def get_actual_count(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+        ),
+        Value(0),
+    )
+
+
+def reconcile_counters(dry_run=False):
+    drift = {}
+    for model, field, related_model, related_field in COUNTERS:
+        stale = model.objects.alias(
+            actual=get_actual_count(related_model, related_field),
+        ).filter(~Q(**{field: F('actual')}))
+        if dry_run:
+            drift[f'{model.__name__}.{field}'] = stale.count()
+        else:
+            drift[f'{model.__name__}.{field}'] = stale.update(
+                **{field: get_actual_count(related_model, related_field)},
+            )
+    return drift
+
+
+def update_counters(related_model, pks, delta):
+    for model, field, counted_model, related_field in COUNTERS:
+        if counted_model is related_model:
+            model.objects.filter(pk__in=pks).update(
+                **{field: get_counter_value(field, delta)},
+            )
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import transaction
+
+from recipies.models import FeedItem, Recipe
+from users.models import Subscription
+
+
+def add_recipe_to_feeds(recipe):
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in Subscription.objects.filter(
+                author_id=recipe.author_id,
+            ).values_list('user_id', flat=True)
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author_to_feed(user_id, author_id):
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id=author_id,
+            )
+            .order_by('-pub_date', '-id')
+            .values_list('id', 'pub_date')[: settings.FEED_FOLLOW_RECIPES]
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id,
+        recipe__author_id=author_id,
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_feeds(user_ids=None):
+    subscriptions = Subscription.objects.all()
+    feed_items = FeedItem.objects.all()
+    if user_ids is not None:
+        subscriptions = subscriptions.filter(user_id__in=user_ids)
+        feed_items = feed_items.filter(user_id__in=user_ids)
+    feed_items.delete()
+    followers = {}
+    for user_id, author_id in subscriptions.values_list(
+        'user_id',
+        'author_id',
+    ):
+        followers.setdefault(author_id, []).append(user_id)
+    batch = []
+    created = 0
+    for recipe in Recipe.objects.top_per_author(
+        list(followers),
+        settings.FEED_FOLLOW_RECIPES,
+    ).only('id', 'author_id', 'pub_date'):
+        for user_id in followers[recipe.author_id]:
+            batch.append(
+                FeedItem(
+                    user_id=user_id,
+                    recipe_id=recipe.id,
+                    pub_date=recipe.pub_date,
+                ),
+            )
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            created += len(FeedItem.objects.bulk_create(batch))
+            batch = []
+    created += len(FeedItem.objects.bulk_create(batch))
+    return created
@@ -0,0 +1,80 @@
+import json
+
+from django.db import models
+
+
+class IntegerArrayField(models.Field):
+    description = 'Sorted list of integers'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', list)
+        super().__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'integer[]'
+        return 'text'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        value = sorted(value)
+        if connection.vendor == 'postgresql':
+            return value
+        return json.dumps(value)
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+
+class ArrayLookup(models.Lookup):
+    postgresql_operator = None
+    sqlite_template = None
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [
+            self.lhs.output_field.get_db_prep_value(value, connection),
+        ]
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return (
+            f'{lhs} {self.postgresql_operator} {rhs}::integer[]',
+            (*lhs_params, *rhs_params),
+        )
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return (
+            self.sqlite_template.format(lhs=lhs, rhs=rhs),
+            (*lhs_params, *rhs_params),
+        )
+
+
+@IntegerArrayField.register_lookup
+class Overlap(ArrayLookup):
+    lookup_name = 'overlap'
+    postgresql_operator = '&&'
+    sqlite_template = (
+        'EXISTS (SELECT 1 FROM json_each({lhs}) WHERE value IN '
+        '(SELECT value FROM json_each({rhs})))'
+    )
+
+
+@IntegerArrayField.register_lookup
+class Contains(ArrayLookup):
+    lookup_name = 'contains'
+    postgresql_operator = '@>'
+    sqlite_template = (
+        'NOT EXISTS (SELECT 1 FROM json_each({rhs}) WHERE value NOT IN '
+        '(SELECT value FROM json_each({lhs})))'
+    )
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from PIL import Image, ImageOps
+
+from recipies.cache import invalidate_recipes
+from recipies.models import Recipe
+
+VARIANTS_DIR = 'recipies/images/variants'
+VARIANT_FORMATS = (
+    ('', 'JPEG', 'jpg'),
+    ('_webp', 'WEBP', 'webp'),
+)
+VARIANT_QUALITY = 80
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def variants_ready(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') == recipe.image.name
+    )
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=VARIANT_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe_id, force=False):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image',
+        'image_variants',
+    ).first()
+    if recipe is None or not recipe.image:
+        return False
+    if variants_ready(recipe) and not force:
+        return False
+    storage = recipe.image.storage
+    source = recipe.image.name
+    stem = PurePosixPath(source).stem
+    variants = {'source': source}
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        for name, size in settings.RECIPE_IMAGE_VARIANTS.items():
+            for suffix, image_format, extension in VARIANT_FORMATS:
+                variants[name + suffix] = storage.save(
+                    f'{VARIANTS_DIR}/{stem}_{name}.{extension}',
+                    render_variant(image, size, image_format),
+                )
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants,
+    )
+    if updated:
+        invalidate_recipes([recipe_id])
+    stale = recipe.image_variants if updated else variants
+    for key, path in stale.items():
+        if key != 'source' and storage.exists(path):
+            storage.delete(path)
+    return bool(updated)
+
+
+def generate_variants_in_worker(recipe_id, force=False):
+    try:
+        return generate_variants(recipe_id, force)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe_id):
+    if settings.RECIPE_IMAGE_VARIANTS_ASYNC:
+        return executor.submit(generate_variants_in_worker, recipe_id)
+    return generate_variants(recipe_id)
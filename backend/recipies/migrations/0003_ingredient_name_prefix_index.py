@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDEX_NAME = "recipies_ingredient_name_prefix_idx"
+
+# Matches the SQL of Ingredient.objects.filter(name__istartswith=...):
+# UPPER("name"::text) LIKE UPPER('prefix%') on PostgreSQL and a
+# case-insensitive LIKE on SQLite.
+CREATE_INDEX_SQL = {
+    "postgresql": (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipies_ingredient "
+        "(UPPER(name::text) text_pattern_ops)"
+    ),
+    "sqlite": (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipies_ingredient "
+        "(name COLLATE NOCASE)"
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql = CREATE_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX_SQL:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ("recipies", "Recipe", "favorites_count", "recipies", "Favorite", "recipe"),
+    (
+        "recipies",
+        "Recipe",
+        "shopping_cart_count",
+        "recipies",
+        "ShoppingList",
+        "recipe",
+    ),
+    ("users", "User", "recipes_count", "recipies", "Recipe", "author"),
+    ("users", "User", "followers_count", "users", "Subscription", "author"),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, related_app, related_model, related_field in COUNTERS:
+        related = apps.get_model(related_app, related_model)
+        apps.get_model(app, model).objects.update(
+            **{
+                field: Coalesce(
+                    Subquery(
+                        related.objects.filter(**{related_field: OuterRef("pk")})
+                        .order_by()
+                        .values(related_field)
+                        .annotate(total=Count("pk"))
+                        .values("total")
+                    ),
+                    Value(0),
+                )
+            }
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0006_feeditem"),
+        ("users", "0002_user_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В избранном"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="shopping_cart_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В списках покупок"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+INDEX_NAME = "recipies_recipe_name_prefix_idx"
+
+# Backs the admin's case-insensitive "^name" search, see
+# 0003_ingredient_name_prefix_index.
+CREATE_INDEX_SQL = {
+    "postgresql": (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipies_recipe "
+        "(UPPER(name::text) text_pattern_ops)"
+    ),
+    "sqlite": (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipies_recipe "
+        "(name COLLATE NOCASE)"
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql = CREATE_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX_SQL:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0007_recipe_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
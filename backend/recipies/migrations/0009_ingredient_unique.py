@@ -0,0 +1,46 @@
+# Generated by Django 4.2.4 on 2026-10-18 18:07
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model("recipies", "Ingredient")
+    IngredientAmount = apps.get_model("recipies", "IngredientAmount")
+    duplicates = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(keep=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        keep = duplicate.pop("keep")
+        duplicate.pop("total")
+        others = Ingredient.objects.filter(**duplicate).exclude(id=keep)
+        for other in others.values_list("id", flat=True):
+            # A recipe can reference every ingredient only once.
+            IngredientAmount.objects.filter(
+                ingredient_id=other,
+                recipe__in=IngredientAmount.objects.filter(
+                    ingredient_id=keep,
+                ).values("recipe"),
+            ).delete()
+            IngredientAmount.objects.filter(ingredient_id=other).update(
+                ingredient_id=keep,
+            )
+        others.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0008_recipe_name_prefix_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"), name="unique_ingredient"
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.4 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+INDEX_NAME = "recipies_recipe_search_idx"
+
+FILL_SEARCH_INGREDIENTS_SQL = {
+    "postgresql": (
+        "UPDATE recipies_recipe SET search_ingredients = names.names "
+        "FROM (SELECT amount.recipe_id, "
+        "string_agg(ingredient.name, ' ' ORDER BY ingredient.name) AS names "
+        "FROM recipies_ingredientamount amount "
+        "JOIN recipies_ingredient ingredient "
+        "ON ingredient.id = amount.ingredient_id "
+        "GROUP BY amount.recipe_id) names "
+        "WHERE names.recipe_id = recipies_recipe.id"
+    ),
+    "sqlite": (
+        "UPDATE recipies_recipe SET search_ingredients = COALESCE(("
+        "SELECT group_concat(name, ' ') FROM ("
+        "SELECT ingredient.name FROM recipies_ingredientamount amount "
+        "JOIN recipies_ingredient ingredient "
+        "ON ingredient.id = amount.ingredient_id "
+        "WHERE amount.recipe_id = recipies_recipe.id "
+        "ORDER BY ingredient.name)), '')"
+    ),
+}
+
+# Ingredient names live in another table, so they are denormalized into
+# search_ingredients by the application and the vector itself is kept up
+# to date by PostgreSQL.
+CREATE_SEARCH_VECTOR_SQL = (
+    "ALTER TABLE recipies_recipe ADD COLUMN IF NOT EXISTS search_vector "
+    "tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', name), 'A') || "
+    "setweight(to_tsvector('russian', search_ingredients), 'B') || "
+    "setweight(to_tsvector('russian', text), 'C')"
+    ") STORED",
+    f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipies_recipe "
+    "USING GIN (search_vector)",
+)
+
+
+def create_search_vector(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor in FILL_SEARCH_INGREDIENTS_SQL:
+        schema_editor.execute(FILL_SEARCH_INGREDIENTS_SQL[vendor])
+    if vendor == "postgresql":
+        for sql in CREATE_SEARCH_VECTOR_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        schema_editor.execute(
+            "ALTER TABLE recipies_recipe DROP COLUMN IF EXISTS search_vector"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0009_ingredient_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_ingredients",
+            field=models.TextField(
+                blank=True,
+                default="",
+                editable=False,
+                verbose_name="Ингредиенты для поиска",
+            ),
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
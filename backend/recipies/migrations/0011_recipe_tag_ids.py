@@ -0,0 +1,60 @@
+# Generated by Django 4.2.4 on 2026-10-18 18:32
+
+from django.db import migrations
+
+import recipies.fields
+
+INDEX_NAME = "recipies_recipe_tag_ids_idx"
+
+FILL_TAG_IDS_SQL = {
+    "postgresql": (
+        "UPDATE recipies_recipe SET tag_ids = COALESCE(("
+        "SELECT array_agg(tag_id ORDER BY tag_id) FROM recipies_recipe_tags "
+        "WHERE recipe_id = recipies_recipe.id), '{}')"
+    ),
+    "sqlite": (
+        "UPDATE recipies_recipe SET tag_ids = COALESCE(("
+        "SELECT json_group_array(tag_id) FROM ("
+        "SELECT tag_id FROM recipies_recipe_tags "
+        "WHERE recipe_id = recipies_recipe.id ORDER BY tag_id)), '[]')"
+    ),
+}
+
+# Serves the && ("any of") and @> ("all of") operators of the tags filter.
+CREATE_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipies_recipe "
+    "USING GIN (tag_ids)"
+)
+
+
+def fill_tag_ids(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor in FILL_TAG_IDS_SQL:
+        schema_editor.execute(FILL_TAG_IDS_SQL[vendor])
+    if vendor == "postgresql":
+        schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0010_recipe_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="tag_ids",
+            field=recipies.fields.IntegerArrayField(
+                blank=True,
+                default=list,
+                editable=False,
+                verbose_name="Идентификаторы тегов",
+            ),
+        ),
+        migrations.RunPython(fill_tag_ids, drop_index),
+    ]
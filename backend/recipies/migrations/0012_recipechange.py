@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipies", "0011_recipe_tag_ids"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("recipe_id", models.BigIntegerField(verbose_name="Рецепт")),
+            ],
+            options={
+                "verbose_name": "Изменение рецепта",
+                "verbose_name_plural": "Изменения рецептов",
+                "ordering": ("id",),
+            },
+        ),
+    ]
@@ -1,10 +1,29 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models.functions import RowNumber
 from rest_framework import status
 
-from users.models import User
+from recipies.fields import IntegerArrayField
+from users.models import CountersMixin, User
 
 TAG_SLUG_MAX_LENGTH = 200
+SEARCH_CONFIG = 'russian'
+
+
+class SearchVectorColumn(models.Expression):
+    # search_vector is generated by PostgreSQL and has a GIN index, see
+    # 0010_recipe_search. It is no model field, so it is neither written
+    # nor selected with every recipe. The alias is taken from the query
+    # being compiled, subqueries reference their own row.
+    output_field = SearchVectorField()
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.quote_name_unless_alias(
+            compiler.query.get_initial_alias(),
+        )
+        return f'{alias}.search_vector', []
 
 
 class Tag(models.Model):
@@ -56,6 +75,12 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ('-name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            ),
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         default_related_name = 'ingredient'
@@ -64,7 +89,81 @@ class Ingredient(models.Model):
         return self.name[:30]
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def annotate_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk'),
+                ),
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingList.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk'),
+                ),
+            ),
+        )
+
+    def search(self, query):
+        terms = query.split()
+        if not terms:
+            return self
+        if connections[self.db].vendor == 'postgresql':
+            vector = SearchVectorColumn()
+            search_query = SearchQuery(
+                query,
+                config=SEARCH_CONFIG,
+                search_type='websearch',
+            )
+            return (
+                self.alias(search_vector=vector)
+                .filter(search_vector=search_query)
+                .alias(search_rank=SearchRank(vector, search_query))
+                .order_by('-search_rank', '-pub_date', '-id')
+            )
+        condition = models.Q()
+        for term in terms:
+            condition &= (
+                models.Q(name__icontains=term)
+                | models.Q(search_ingredients__icontains=term)
+                | models.Q(text__icontains=term)
+            )
+        return (
+            self.filter(condition)
+            .alias(
+                search_rank=models.Case(
+                    models.When(name__icontains=query, then=2),
+                    models.When(search_ingredients__icontains=query, then=1),
+                    default=0,
+                ),
+            )
+            .order_by('-search_rank', '-pub_date', '-id')
+        )
+
+    def top_per_author(self, authors, limit=None):
+        queryset = self.filter(author__in=authors)
+        if limit is None:
+            return queryset
+        return queryset.annotate(
+            row_number=models.Window(
+                RowNumber(),
+                partition_by=models.F('author'),
+                order_by=(
+                    models.F('pub_date').desc(),
+                    models.F('id').desc(),
+                ),
+            ),
+        ).filter(row_number__lte=limit)
+
+
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -74,6 +173,11 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Список тегов',
     )
+    tag_ids = IntegerArrayField(
+        blank=True,
+        editable=False,
+        verbose_name='Идентификаторы тегов',
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='IngredientAmount',
@@ -87,9 +191,31 @@ class Recipe(models.Model):
         upload_to='recipies/images/',
         verbose_name='Ссылка на картинку на сайте',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии картинки',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
+    search_ingredients = models.TextField(
+        default='',
+        blank=True,
+        editable=False,
+        verbose_name='Ингредиенты для поиска',
+    )
     cooking_time = models.SmallIntegerField(
         verbose_name='Время приготовления (в минутах)',
         validators=[MinValueValidator(1)],
@@ -100,11 +226,21 @@ class Recipe(models.Model):
         editable=False,
     )
 
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipies'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name[:30]
@@ -189,3 +325,52 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.user.username} добавил в корзину' f'{self.recipe.name}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe_id')
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Лента подписок'
+        default_related_name = 'feed_items'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_item_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.recipe_id}'
+
+
+class RecipeChange(models.Model):
+    recipe_id = models.BigIntegerField(verbose_name='Рецепт')
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self):
+        return f'{self.id}: {self.recipe_id}'
@@ -0,0 +1,24 @@
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipies.models import IngredientAmount, Recipe
+
+
+def refresh_search_ingredients(recipe_ids):
+    recipe_ids = set(recipe_ids)
+    names = defaultdict(list)
+    for recipe_id, name in (
+        IngredientAmount.objects.filter(recipe_id__in=recipe_ids)
+        .order_by('ingredient__name')
+        .values_list('recipe_id', 'ingredient__name')
+    ):
+        names[recipe_id].append(name)
+    Recipe.objects.bulk_update(
+        [
+            Recipe(id=recipe_id, search_ingredients=' '.join(names[recipe_id]))
+            for recipe_id in recipe_ids
+        ],
+        ('search_ingredients',),
+        batch_size=settings.SEARCH_BATCH_SIZE,
+    )
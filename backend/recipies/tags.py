@@ -0,0 +1,22 @@
+from collections import defaultdict
+
+from recipies.models import Recipe
+
+BATCH_SIZE = 1000
+
+
+def refresh_tag_ids(recipe_ids):
+    recipe_ids = set(recipe_ids)
+    tag_ids = defaultdict(list)
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).values_list('recipe_id', 'tag_id'):
+        tag_ids[recipe_id].append(tag_id)
+    Recipe.objects.bulk_update(
+        [
+            Recipe(id=recipe_id, tag_ids=tag_ids[recipe_id])
+            for recipe_id in recipe_ids
+        ],
+        ('tag_ids',),
+        batch_size=BATCH_SIZE,
+    )
@@ -1,19 +1,26 @@
 from django.contrib import admin
 
-from recipies.admin import BaseAdmin
+from recipies.admin import AuthorFilter, BaseAdmin, UserFilter
 from users.models import Subscription, User
 
 
 @admin.register(User)
 class UserAdmin(BaseAdmin):
-    list_filter = (
+    list_display = (
         'username',
         'email',
+        'first_name',
+        'last_name',
+        'recipes_count',
+        'followers_count',
     )
-    search_fields = ('email', 'username', 'first_name', 'last_name')
+    search_fields = ('^username', '^email')
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(BaseAdmin):
-    list_filter = ('user', 'author')
-    search_fields = ('user', 'author')
+    list_display = ('id', 'user', 'author')
+    list_filter = (UserFilter, AuthorFilter)
+    list_select_related = ('user', 'author')
+    search_fields = ('^author__username',)
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Back the admin's case-insensitive prefix searches ("^username",
+# "^email"): UPPER("field"::text) LIKE UPPER('prefix%') on PostgreSQL and
+# a case-insensitive LIKE on SQLite.
+INDEXES = (
+    ("users_user_username_prefix_idx", "username"),
+    ("users_user_email_prefix_idx", "email"),
+)
+CREATE_INDEX_SQL = {
+    "postgresql": (
+        "CREATE INDEX IF NOT EXISTS {name} ON users_user "
+        "(UPPER({field}::text) text_pattern_ops)"
+    ),
+    "sqlite": (
+        "CREATE INDEX IF NOT EXISTS {name} ON users_user ({field} COLLATE NOCASE)"
+    ),
+}
+
+
+def create_indexes(apps, schema_editor):
+    sql = CREATE_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        for name, field in INDEXES:
+            schema_editor.execute(sql.format(name=name, field=field))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX_SQL:
+        for name, _ in INDEXES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_user_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
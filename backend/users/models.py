@@ -9,7 +9,28 @@ LAST_NAME_MAX_LENGTH = 150
 PASSWORD_MAX_LENGTH = 150
 
 
-class User(AbstractUser):
+class CountersMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        # Counters only change through F() updates, a full save would write
+        # back the values read with the instance and lose concurrent ones.
+        if (
+            not self._state.adding
+            and not args
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     username = models.CharField(
         max_length=USERNAME_MAX_LENGTH,
         unique=True,
@@ -30,6 +51,18 @@ class User(AbstractUser):
     password = models.CharField(
         max_length=PASSWORD_MAX_LENGTH,
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ('-username',)